@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Pins the cost of `import busypal`, and of the startup path of a CLI tool (importing `busy` and
+decorating a function with it), using `python -X importtime`. Exits with a non-zero status if either
+pulls in any of the heavy dependencies that should only be loaded once a spinner is drawn or a
+session probe runs, or if it takes longer than the budget (in milliseconds).
+
+    PYTHONPATH=. python benchmarks/importtime.py [budget in ms]
+'''
+
+import os
+import sys
+import subprocess
+
+budget = 25.0 # ms: about 1 ms for the import and 6-8 ms for the startup on a laptop (mostly threading, functools
+              #   and collections), loose enough for a slow CI box; the deferred modules are the hard check
+deferred = ['psutil', 'colored', 'multiprocessing', 'contextlib', 're', 'inspect']
+statements = {
+    'import busypal': 'import busypal',
+    'startup': 'from busypal import busy\n@busy("Working")\ndef work(): pass',
+}
+
+def importtime(statement='import busypal', repeat=5):
+    '''
+    Returns the best time in ms of the imports that `statement` triggers on top of those of a bare
+    interpreter, and the set of modules imported along the way
+    '''
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [os.getcwd(), os.environ.get('PYTHONPATH')])))
+    best, modules = None, set()
+    for _ in range(repeat):
+        stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                                env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+        baseline = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'],
+                                  env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+        already = {line.split('|')[-1].strip() for line in baseline.splitlines() if line.startswith('import time:')}
+        ms = 0.0
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            if name.strip() in already:
+                continue
+            modules.add(name.strip())
+            if not name[1:].startswith(' '): # - a top-level import, whose time includes that of the nested ones
+                ms += int(cumulative)/1000
+        best = ms if best is None else min(best, ms)
+    return best, modules
+
+def main(budget=budget):
+    status = 0
+    for name, statement in statements.items():
+        ms, modules = importtime(statement)
+        loaded = [module for module in deferred if module in modules]
+        print(f'{name}: {ms:.2f} ms (budget {budget} ms)')
+        if loaded:
+            print(f'eagerly imported: {", ".join(loaded)}')
+        if loaded or ms > budget:
+            status = 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main(*map(float, sys.argv[1:])))
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Per-call overhead of a `busy`-decorated function compared to the bare function.
+The spinners are drawn into an in-memory stdout so that the terminal does not get in the way.
+
+    PYTHONPATH=. python benchmarks/overhead.py [number of calls]
+'''
+
+import io
+import sys
+import timeit
+from contextlib import redirect_stdout
+from busypal import busy
+
+def bare():
+    pass
+
+variants = {
+    'bare'                 : bare,
+    'busy (silent)'        : busy(skip=2)(bare),
+    'busy (message only)'  : busy('Working', skip=1)(bare),
+    'busy (animated)'      : busy('Working', skip=-1)(bare),
+    'busy (show_after=1)'  : busy('Working', skip=-1, show_after=1)(bare),
+}
+
+def main(number=20000):
+    with redirect_stdout(io.StringIO()):
+        timings = {name: min(timeit.repeat(func, number=number, repeat=3))/number for name, func in variants.items()}
+    for name, seconds in timings.items():
+        overhead = seconds - timings['bare']
+        print(f'{name:<22} {seconds*1e6:9.2f} us/call   overhead {overhead*1e6:9.2f} us/call')
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Runs every benchmark of busypal's hot paths offline, with the spinners drawn into memory, and
+writes the results as JSON so that two runs (e.g. two releases) can be compared:
+
+    PYTHONPATH=. python benchmarks/suite.py [--output results.json] [--quick] [--compare old.json]
+
+* overhead: per-call cost of a `busy`-decorated function over the bare one, for a short (empty)
+  and a long (a couple of ms of pure-Python work) call
+* animation: frames per second and renderer CPU time per frame for each of the `anim` styles as
+  the first and as the second spinner, along with the bytes sent per frame
+* session: cost of the first (probing) and of a memoized `session.viewedonscreen()` call
+* gil: slowdown of a CPU-bound pure-Python workload while a spinner is drawn next to it
+* import: time of `import busypal` (see importtime.py)
+'''
+
+import io
+import json
+import time
+import timeit
+import platform
+import argparse
+from contextlib import redirect_stdout
+
+import busypal
+from busypal import BusyPal, busy, session
+from busypal.sink import MemorySink
+
+import overhead
+import importtime
+
+def crunch(n=2000000):
+    ' A fixed amount of pure-Python CPU work '
+    total = 0
+    for i in range(n):
+        total += i*i % 7
+    return total
+
+def bench_overhead(number):
+    long_call = lambda: crunch(20000)
+    variants = dict(overhead.variants)
+    variants['bare (long)'] = long_call
+    variants['busy animated (long)'] = busy('Working', skip=-1)(long_call)
+    with redirect_stdout(io.StringIO()):
+        seconds = {name: min(timeit.repeat(func, number=number if 'long' not in name else max(number//100, 10), repeat=3)) /
+                         (number if 'long' not in name else max(number//100, 10))
+                   for name, func in variants.items()}
+    results = {}
+    for name, value in seconds.items():
+        bare = seconds['bare (long)'] if 'long' in name else seconds['bare']
+        results[name] = {'seconds': value, 'overhead': value-bare}
+    return results
+
+def bench_animation(duration, delay):
+    results = {}
+    for style in range(len(busypal.anim)):
+        for slot in ('spinner1', 'spinner2'):
+            sink = MemorySink(diff=True) # - like a terminal, so that only the changes are sent
+            kwargs = {'style1' if slot == 'spinner1' else 'style2': style}
+            with BusyPal('Benchmarking', fmt=f'{{{slot}}} {{message}} {{outcome}}', skip=-1, delay=delay, sink=sink, **kwargs) as pal:
+                time.sleep(duration)
+            stats = pal.stats or {'frames': 0, 'fps': 0.0, 'render_time': 0.0}
+            frames = stats['frames']
+            results[f'{style}/{slot}'] = {
+                'frames': frames,
+                'fps': stats['fps'],
+                'cpu_per_frame': stats['render_time']/frames if frames else None,
+                'bytes_per_frame': len(sink.data)/frames if frames else None,
+            }
+    return results
+
+def bench_session(number):
+    def first():
+        session.invalidate()
+        return session.viewedonscreen()
+    return {
+        'viewedonscreen (first call)': min(timeit.repeat(first, number=max(number//100, 10), repeat=3))/max(number//100, 10),
+        'viewedonscreen (memoized)': min(timeit.repeat(session.viewedonscreen, number=number, repeat=3))/number,
+    }
+
+def bench_gil(repeat, delay):
+    def timed(region=None):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            if region is None:
+                crunch()
+            else:
+                with region():
+                    crunch()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+    bare = timed()
+    results = {'bare': bare}
+    for name, region in [('spinner', lambda: BusyPal('Crunching', skip=-1, sink=MemorySink(diff=True))),
+                         (f'spinner (delay={delay})', lambda: BusyPal('Crunching', skip=-1, delay=delay, sink=MemorySink(diff=True))),
+                         ('spinner with {elapsed}', lambda: BusyPal('Crunching', skip=-1, sink=MemorySink(diff=True),
+                                                                    fmt='{spinner} {message} {elapsed} {outcome}'))]:
+        seconds = timed(region)
+        results[name] = {'seconds': seconds, 'slowdown': seconds/bare - 1}
+    return results
+
+def bench_import():
+    ms, modules = importtime.importtime()
+    return {'ms': ms, 'deferred_loaded': [name for name in importtime.deferred if name in modules]}
+
+def run(quick=False):
+    number = 2000 if quick else 20000
+    return {
+        'meta': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'quick': quick},
+        'overhead': bench_overhead(number),
+        'animation': bench_animation(0.2 if quick else 1.0, 0.01 if quick else 0.02),
+        'session': bench_session(number),
+        'gil': bench_gil(2 if quick else 5, 0.01),
+        'import': bench_import(),
+    }
+
+def flatten(results, prefix=''):
+    ' The numbers of `results` as a flat {dotted.key: value} dict '
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix+key] = value
+    return flat
+
+def compare(old, new):
+    ' Prints the numbers that changed by more than 10% between two runs '
+    old, new = flatten(old), flatten(new)
+    for key in sorted(old.keys() & new.keys()):
+        if key.startswith('meta.') or not old[key]:
+            continue
+        change = new[key]/old[key] - 1
+        if abs(change) > 0.1:
+            print(f'{key:<60} {old[key]:12.6g} -> {new[key]:12.6g} ({100*change:+.0f}%)')
+
+def summary(results):
+    ' A few headline numbers '
+    animation = [entry for entry in results['animation'].values() if entry['cpu_per_frame'] is not None]
+    lines = [
+        f"overhead (animated, short call): {1e6*results['overhead']['busy (animated)']['overhead']:.2f} us",
+        f"fps (mean over styles): {sum(entry['fps'] for entry in animation)/len(animation):.1f}",
+        f"cpu per frame (worst style): {1e6*max(entry['cpu_per_frame'] for entry in animation):.1f} us",
+        f"viewedonscreen (memoized): {1e9*results['session']['viewedonscreen (memoized)']:.0f} ns",
+        f"gil slowdown (default delay): {100*results['gil']['spinner']['slowdown']:.1f}%",
+        f"import busypal: {results['import']['ms']:.2f} ms",
+    ]
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--output', default='benchmark-results.json', help='where to write the JSON results')
+    parser.add_argument('--quick', action='store_true', help='fewer repetitions, for a smoke run')
+    parser.add_argument('--compare', metavar='JSON', help='the results of an earlier run to compare with')
+    args = parser.parse_args(argv)
+    results = run(args.quick)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(summary(results))
+    print(f'results written to {args.output}')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,34 @@
-from .busypal import *
-from .session import *
+'''
+The public names below are imported from their submodules on first access (PEP 562), so that
+`import busypal` alone does not pull in psutil, colored, multiprocessing and friends.
+'''
+
+import importlib
+
+_exports = {
+    'busypal': ['BusyPal', 'busy', 'busy_iter', 'anim', 'default_style_id', 'default_delay', 'stylized_done', 'stylized_fail',
+                'omittable_parentheses_decorator', 'RenderPlan', 'Config', 'heartbeat'],
+    'session': ['isterminal', 'isipythonterminal', 'isipythongui', 'isnotebook', 'cmdline_has', 'session_type',
+                'viewedonscreen', 'isparent', 'javascript_friendly', 'parent_cmdline', 'invalidate'],
+    'parallel': ['busy_map'],
+    'progress': ['report'],
+    'timing': ['timings'],
+    'sink': ['MemorySink'],
+}
+_submodules = ['busypal', 'session', 'render', 'helper', 'parallel', 'progress', 'profiler', 'timing', 'sink', 'notebook']
+_origins = {name: module for module, names in _exports.items() for name in names}
+
+__all__ = list(_origins)
+
+def __getattr__(name):
+    if name in _origins:
+        value = getattr(importlib.import_module(f'.{_origins[name]}', __name__), name)
+    elif name in _submodules:
+        value = importlib.import_module(f'.{name}', __name__)
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    globals()[name] = value # - so that we only come through here once per name
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__) | set(_submodules))
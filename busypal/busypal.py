@@ -3,11 +3,14 @@
 
 import sys
 import time
-import re
 import threading
-import colored as cl
+import itertools
 from functools import wraps
+from collections import namedtuple, deque
 from . import session
+from . import timing
+from . import sink as sinks
+from .render import renderer, report_error
 
 """
 -----------------------------------------------------------------------------
@@ -49,7 +52,86 @@ Usage:
 >>>     a_long_running_operation(5) # call a function
 |   ● | Hold on, it is taking longer than expected
 
-*** Do not use the context manager and the decorator together! You'll see a mess.
+*** Functions that are usually fast but occasionally slow can keep the decorator permanently:
+    with `show_after` nothing at all is shown (and no thread is started) unless the call is still
+    running after that many seconds.
+
+>>> @busy('Crunching numbers', show_after=0.5)
+... def sometimes_slow(n):
+...     time.sleep(n)
+
+*** When the long operation is a C extension holding the GIL, the spinner can be drawn by a small
+    helper process instead, so that it keeps moving (and the worker doesn't share the GIL with it):
+
+>>> with BusyPal('Inverting a huge matrix', backend='process'):
+...     numpy.linalg.inv(matrix)
+
+    The helper writes straight to the file descriptor, outside of the block of live lines, so it
+    is only used for a region that has its output to itself: if other regions are live there, or
+    with `redirect=True`, the renderer thread draws it as usual. Anything else written to that
+    output while the helper draws (including `pal.write()`, other regions entered meanwhile) lands
+    on its line until the next frame overwrites it.
+
+*** In a Jupyter notebook, the spinner is a single `display` output animated by the browser with
+    CSS, so that the kernel sends a couple of messages per region rather than one per frame
+    (`backend='notebook'` forces it, any other backend or a `sink` opts out of it).
+
+*** Coroutines work too, either with `async with BusyPal(...)` or by decorating an `async def`
+    function with `busy`. Their spinners are ticked by the event loop itself rather than a thread.
+
+>>> @busy('Fetching')
+... async def fetch(url):
+...     return await client.get(url)
+
+*** Worker processes don't draw spinners of their own. They can report their progress to the
+    parent's spinner through shared memory instead (see `busypal.progress`):
+
+>>> with BusyPal('Crunching', fmt='{spinner} {message} {count} items, {workers} {outcome}', workers=8):
+...     with multiprocessing.Pool(8) as pool:
+...         pool.map(crunch, chunks) # crunch() calls busypal.report() as it goes
+
+*** On busy machines the spinner can back off instead of competing with the real work: with
+    `adaptive=True` (or a (min_delay, max_delay) pair) the frame interval stretches when frames
+    are late or the CPU is loaded. The effective frame rate and the CPU time spent drawing end up
+    in the `stats` attribute once the block exits, and are added up per function or message in
+    `busypal.timings` (`fps` and `render_cpu`), which is where those of `@busy` functions go.
+
+*** To find out where a long region spends its time, `profile=True` samples its stack from the
+    renderer thread every `profile_interval` seconds (`delay` by default) and prints the hottest
+    functions to stderr at the end, while `profile='region.folded'` writes the collapsed stacks
+    for flamegraph.pl or speedscope instead. The samples stay available as `pal.profiler`.
+
+*** A spinner keeps spinning even if the work is deadlocked, unless it has a `stall_timeout`: the
+    work then calls `busypal.heartbeat()` now and then (bumping `count` or reporting from workers
+    counts too), and if the region makes no progress for that long its spinner turns into a blinking
+    yellow fail glyph, the stacks of all threads are dumped once to stderr (or to the file given as
+    `stall_dump`, nowhere if False) and `on_stall(pal)` is called if given.
+
+*** The spinner goes to stdout unless told otherwise with `sink=`: 'stderr', a file descriptor,
+    a stream, a callable getting the bytes or a `busypal.sink.MemorySink` for tests. Every frame
+    is a single bytes write, and on a terminal only the characters that changed are sent.
+
+*** `pal.write(text)` prints `text` without colliding with the spinner: it is queued and written
+    above the live line(s) with the next frame, so that chatty code costs one write per frame
+    rather than one per message. With `redirect=True`, `print()` and the logging handlers writing
+    to stdout or stderr go through it for as long as the region is live, provided that they write
+    where the region draws (e.g. to the same terminal).
+
+*** When the output is not viewed on screen (e.g. redirected to a log file), only the message is
+    written by default. With `non_tty='heartbeat'` a region instead logs a compact line every
+    `log_interval` seconds (60 by default) once it has been busy that long, with the elapsed time
+    and the count/rate if there are any, and then its outcome and duration; `non_tty='json'` does
+    the same with one JSON object per line. The heartbeats of all the regions logging to the same
+    stream go out together in a single write per interval, and a region that finishes within the
+    interval costs a single line, so that even thousands of short regions keep the log small.
+
+*** Every region also records its wall time, CPU time and outcome in `busypal.timings` under the
+    qualified name of the decorated function, or the message of the block, so that a simple
+    `print(busypal.timings.table())` at the end of a run tells how slow the slow paths were
+    (count, mean, min, max and p50/p95/p99 per key; `.json()` for the raw numbers).
+
+*** Nested or concurrent regions (e.g. from several threads) share a single renderer thread and
+    are stacked as a block of lines, nested ones indented under their parent.
 """
 
 default_style_id = 0
@@ -108,13 +190,204 @@ anim[36] = [r'•–––––––––––––',
             r'–––––––––––––•',
              '✘', '✔']
 
-stylized_done = lambda x: cl.fore.GREEN+cl.style.BOLD+x+cl.style.RESET
-stylized_fail = lambda x: cl.fore.RED+cl.style.BOLD+x+cl.style.RESET # cl.style.REVERSE inverts the colors
+# - `colored` (and `re`, `string`) are only imported once a spinner is actually about to be drawn,
+#   so that `import busypal` stays cheap for runs that never show one
+
+def stylized_done(x):
+    import colored as cl
+    return cl.fore.GREEN+cl.style.BOLD+x+cl.style.RESET
+
+def stylized_fail(x):
+    import colored as cl
+    return cl.fore.RED+cl.style.BOLD+x+cl.style.RESET # cl.style.REVERSE inverts the colors
+
+stoppedtext = 'Stopped.' # the outcome of a `busy_iter` loop left before the end, neither done nor failed
+
+def format_field(value, spec, conversion):
+    if conversion == 'r':
+        value = repr(value)
+    elif conversion == 's':
+        value = str(value)
+    elif conversion == 'a':
+        value = ascii(value)
+    return format(value, spec)
+
+def compile_template(fmt, static, cycling, live=(), escape=None):
+    '''
+    Splits `fmt` into a list of literal parts with the `static` fields already substituted, a list
+    of `(index, frames)` slots, one for each field in `cycling`, to be filled in per frame and a list
+    of `(index, name, spec, conversion)` slots for the `live` fields whose values change as we go.
+    The literal text of `fmt` goes through `escape` if given (e.g. `html.escape`), the fields don't.
+    '''
+    from string import Formatter
+    parts, slots, fields, literal = [], [], [], ''
+    for text, name, spec, conversion in Formatter().parse(fmt):
+        literal += escape(text) if escape is not None else text
+        if name is None:
+            continue
+        if name in cycling:
+            parts.append(literal)
+            slots.append((len(parts), tuple(format_field(frame, spec, conversion) for frame in cycling[name])))
+            parts.append('')
+            literal = ''
+        elif name in static:
+            literal += format_field(static[name], spec, conversion)
+        elif name in live:
+            parts.append(literal)
+            fields.append((len(parts), name, spec, conversion))
+            parts.append('')
+            literal = ''
+        else:
+            raise KeyError(f'unknown field {{{name}}} in `fmt`')
+    parts.append(literal)
+    return parts, slots, fields
+
+def fill(parts, fields, values):
+    for index, name, spec, conversion in fields:
+        parts[index] = format_field(values[name], spec, conversion)
+    return parts
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes:02d}:{seconds:02d}'
+
+def format_rate(rate, unit):
+    for prefix in ('', 'k', 'M', 'G'):
+        if abs(rate) < 999.95:
+            break
+        rate /= 1000
+    return f'{rate:.1f}{prefix}{unit}/s'
+
+# - the fields of `fmt` whose values are worked out for every frame (see `BusyPal.values`)
+live_fields = ('count', 'total', 'rate', 'eta', 'elapsed', 'workers')
+
+class RenderPlan:
+    '''
+    Everything that is needed to draw a BusyPal line, worked out once beforehand: the busy line
+    as a fixed template with the static parts already substituted plus the cycles of pre-styled
+    spinner frames, and the final done/fail lines. Drawing a frame is then an index step and a join
+    (plus formatting the live fields such as {count} or {elapsed}, if `fmt` has any).
+    The work itself is deferred to `compile`, i.e. until a spinner is actually going to be shown.
+    '''
+
+    def __init__(self, fmt, message, spinners, donetext, failtext, cleanup):
+        # - `spinners` maps 'spinner1'/'spinner2' to the tuple (frames, color, typeface)
+        self.args = (fmt, message, spinners, donetext, failtext, cleanup)
+        self.live = any('{'+name in fmt for name in live_fields)
+        self.compiled = False
+
+    def compile(self):
+        if self.compiled:
+            return self
+        fmt, message, spinners, donetext, failtext, cleanup = self.args
+        line = BusyPal.remove_block('outcome', fmt)
+        if not line.endswith(' '):
+            # - add an additional space here because sometimes the last character blinks unwantedly
+            line += ' '
+        cycling = {key: BusyPal.stylize_frames(*spec) for key, spec in spinners.items()}
+        self.parts, self.slots, self.fields = compile_template(line, {'message': message}, cycling, live_fields)
+        self.template, self.stalled, self.stopped = line, None, None
+        if cleanup is True:
+            self.done = self.fail = None # the line is blanked out instead
+        else:
+            self.done = self.final_line(fmt, message, spinners, cleanup, -1, 'green', stylized_done(donetext))
+            self.fail = self.final_line(fmt, message, spinners, cleanup, -2, 'red', stylized_fail(failtext))
+        self.compiled = True
+        return self
+
+    @staticmethod
+    def final_line(fmt, message, spinners, cleanup, index, color, outcome):
+        import colored as cl
+        static = {'message': message, 'outcome': outcome}
+        for key in ('spinner1', 'spinner2', 'message', 'outcome'):
+            if key in fmt and key in cleanup:
+                fmt = BusyPal.remove_block(key, fmt)
+        for key, (frames, _, _) in spinners.items():
+            static[key] = cl.stylize(frames[index], cl.fg(color)+cl.attr('bold'))
+        return compile_template(fmt, static, {}, live_fields)
+
+    def stalled_slots(self):
+        ''' The spinner slots of a stalled region: its fail glyph blinking in yellow, compiled on first use '''
+        if self.stalled is None:
+            import colored as cl
+            _, _, spinners, _, _, _ = self.args
+            cycling = {key: (cl.stylize(frames[-2], cl.fg('yellow')+cl.attr('bold')), ' '*len(frames[-2]))
+                       for key, (frames, _, _) in spinners.items()}
+            _, self.stalled, _ = compile_template(self.template, {'message': ''}, cycling, live_fields)
+        return self.stalled
+
+    def line(self, tick, values=None, stalled=False):
+        ''' The busy line to be written at the `tick`-th frame, `values` being those of the live fields '''
+        parts = self.parts.copy()
+        for index, frames in (self.stalled_slots() if stalled else self.slots):
+            parts[index] = frames[tick % len(frames)]
+        if self.fields:
+            fill(parts, self.fields, values)
+        return ''.join(parts)
+
+    def final(self, failed, values=None, stopped=False):
+        ''' The fail/done line (or the neutral one if `stopped`), or None if the line is to be blanked out '''
+        if stopped and self.done is not None and self.stopped is None:
+            import colored as cl
+            fmt, message, spinners, _, _, cleanup = self.args
+            self.stopped = self.final_line(fmt, message, spinners, cleanup, -1, 'blue',
+                                           cl.fore.BLUE+cl.style.BOLD+stoppedtext+cl.style.RESET)
+        template = self.stopped if stopped and self.done is not None else self.fail if failed else self.done
+        if template is None:
+            return None
+        parts, _, fields = template
+        if fields:
+            parts = fill(parts.copy(), fields, values)
+        return ''.join(parts).lstrip()
+
+# - set in the workers of `busy_map` (see `silence`) so that whatever BusyPal they run stays quiet
+silenced = False
+local = threading.local()
+
+# - thread ident -> time of its last `heartbeat()`
+beats = {}
+
+def heartbeat():
+    '''
+    Tells the `stall_timeout` watchdog of the busy region(s) of the calling thread that the work is
+    still making progress. A single dict store: cheap enough to be called from the innermost loop.
+    '''
+    beats[threading.get_ident()] = time.monotonic()
+
+def dump_stacks(file):
+    ' Writes the stack of every thread to `file`, through faulthandler if it is backed by a file descriptor '
+    import faulthandler
+    try:
+        file.flush()
+        faulthandler.dump_traceback(file, all_threads=True)
+    except (AttributeError, ValueError, OSError): # - no fileno(), e.g. a notebook's stderr
+        import traceback
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            file.write(f'Thread {names.get(ident, hex(ident))}:\n' + ''.join(traceback.format_stack(frame)))
+        file.flush()
+
+def silence(threads_only=False):
+    '''
+    Pool initializer that keeps every BusyPal of the worker (a process, or only the current thread
+    if `threads_only`) from drawing, since the terminal belongs to the parent's spinner.
+    '''
+    global silenced
+    if threads_only:
+        local.silenced = True
+    else:
+        silenced = True
+
+Config = namedtuple('Config', ['message', 'fmt', 'donetext', 'failtext', 'cleanup', 'delay', 'skip', 'show_after', 'backend', 'adaptive', 'unit', 'profile', 'profile_interval',
+                               'stall_timeout', 'on_stall', 'stall_dump', 'non_tty', 'log_interval', 'redirect',
+                               'sink', 'spinners', 'plan'])
 
 class BusyPal:
 
     @staticmethod
-    def generate_spin(frames,color,typeface):
+    def stylize_frames(frames,color,typeface):
+        import colored as cl
         if color is None:
             colors = ''
         else:
@@ -124,11 +397,13 @@ class BusyPal:
             for key, value in color.items():
                 fbg = getattr(cl, key) # 'fore', 'back'
                 colors += getattr(fbg, value.upper())
-        stylized_frames = lambda x: getattr(cl.style,typeface)+colors+x+cl.style.RESET
-        while True: 
-            for frame in frames[:-2]:
-                yield stylized_frames(frame)
-    
+        prefix = getattr(cl.style,typeface)+colors
+        return tuple(prefix+frame+cl.style.RESET for frame in frames[:-2])
+
+    @staticmethod
+    def generate_spin(frames,color,typeface):
+        return itertools.cycle(BusyPal.stylize_frames(frames,color,typeface))
+
     @staticmethod
     def remove_block(key, line):
         key='{'+key+'}'
@@ -136,52 +411,96 @@ class BusyPal:
             line = line.replace(pattern, sub)
         return line
     
-    def __init__(self, message='', style=None, style1=None, style2=None, frames=None, frames1=None, frames2=None, delay=None,
-                 fmt='{spinner} {message} {outcome}', donetext='Done!', failtext='Failed!', cleanup=False, skip=0, verbose=True):
-        
+    @staticmethod
+    def spinner_spec(style, frames):
+        ''' Resolves the style of a spinner into the tuple (frames, color, typeface) '''
+        if isinstance(style, dict):
+            style_id = style['id'] if 'id' in style else default_style_id
+            frames = style['frames'] if 'frames' in style else None
+            color = style['color'] if 'color' in style else None # DARK_ORANGE
+            typeface = style['typeface'] if 'typeface' in style else 'RESET'
+        else:
+            if style is not None and not isinstance(style, (int,str,list,tuple)):
+                raise ValueError('styles only accept dictionaries, strings, list, tuples and integers')
+            style = style if style is not None else default_style_id
+            color = None
+            typeface = 'RESET'
+            if isinstance(style, (str,list,tuple)):
+                frames = style
+            else:
+                style_id = style
+        return (frames if frames is not None else anim[style_id], color, typeface)
+
+    @classmethod
+    def configure(cls, message='', style=None, style1=None, style2=None, frames=None, frames1=None, frames2=None, delay=None,
+                  fmt='{spinner} {message} {outcome}', donetext='Done!', failtext='Failed!', cleanup=False, skip=0, verbose=True,
+                  show_after=None, backend='thread', adaptive=False, unit='it', profile=False, profile_interval=None,
+                  stall_timeout=None, on_stall=None, stall_dump=True, non_tty='message', log_interval=60.0, redirect=False,
+                  sink=None):
+        '''
+        Validates the arguments of BusyPal and compiles them into an immutable Config which only
+        depends on these arguments. `busy` does this once at decoration time so that each call of
+        the decorated function only has to create a lightweight BusyPal from it.
+        '''
+
         # TODO style_message, style_outcome
-        # TODO simultaneously print a message without overlap with the sppinners [similar to tqdm.write() method] - also look at https://pypi.org/project/enlighten/
         # TODO different enter/busy/exit styles for the message
-        # TODO add the time it took to finish the process somehow in __exit__
-        # TODO add a timer showing the elapsed time as a spinner style
-        
+
         if not isinstance(skip, (bool, int)):
             raise ValueError('`skip` should be of type boolean or integer.')
 
-        self.skip = skip
+        if show_after is not None and (not isinstance(show_after, (int, float)) or show_after < 0):
+            raise ValueError('`show_after` should be a non-negative number of seconds.')
 
-        if (skip==0 or not skip) and not session.viewedonscreen():
-            self.skip = 1 # it does not show the animation part at least
-            
-        if skip<0:
-            self.skip = 0 # it does not skip under any circumstances
+        if backend not in ('thread', 'process', 'notebook'):
+            raise ValueError("`backend` should be one of 'thread', 'process' or 'notebook'.")
 
-        self.message = message if verbose else ''
-        
-        if not self.skip:
+        if profile_interval is not None and not profile_interval > 0:
+            raise ValueError('`profile_interval` should be a positive number of seconds.')
 
-            if not verbose and '{message}' in fmt:
-                self.fmt = self.remove_block('message', fmt)
-            else:
-                self.fmt = fmt
+        if stall_timeout is not None and not stall_timeout > 0:
+            raise ValueError('`stall_timeout` should be a positive number of seconds.')
+
+        if non_tty not in ('message', 'heartbeat', 'json'):
+            raise ValueError("`non_tty` should be one of 'message', 'heartbeat' or 'json'.")
+
+        if not log_interval > 0:
+            raise ValueError('`log_interval` should be a positive number of seconds.')
+
+        if delay is None:
+            delay = default_delay
+        elif isinstance(delay, bool) or not isinstance(delay, (int, float)) or not delay > 0:
+            # - the renderer would spin on a frame due in the past, over and over
+            raise ValueError("`delay` should be a positive number of seconds, try 0.1 or do not set it so that we can use the default value.")
+
+        sinks.check(sink)
+
+        message = message if verbose else ''
+        spinners = {}
+        plan = None
 
-            self.donetext = donetext
-            self.failtext = failtext
-            self.cleanup = cleanup
+        if skip<=0: # the animation may be shown unless the output turns out not to be viewed on the screen
 
-            if not isinstance(self.cleanup, bool):
-                if isinstance(self.cleanup, str):
-                    self.cleanup = re.sub(r'\bspinner\b', 'spinner1', self.cleanup) 
-                    self.cleanup = [self.cleanup]
+            if not verbose and '{message}' in fmt:
+                fmt = cls.remove_block('message', fmt)
+
+            if not isinstance(cleanup, bool):
+                import re
+                if isinstance(cleanup, str):
+                    cleanup = re.sub(r'\bspinner\b', 'spinner1', cleanup) 
+                    cleanup = [cleanup]
                 else:
-                    self.cleanup = [re.sub(r'\bspinner\b', 'spinner1', item) for item in self.cleanup] 
+                    cleanup = [re.sub(r'\bspinner\b', 'spinner1', item) for item in cleanup] 
 
-            if delay and float(delay):
-                if delay==0:
-                    raise ValueError("`delay` can't be zero, try 0.1 (in seconds) or do not set it so that we can use the default value.")
-                self.delay = delay
+            if adaptive is True:
+                adaptive = (delay, 5*delay)
+            elif adaptive:
+                if len(adaptive) != 2 or not all(isinstance(bound, (int, float)) for bound in adaptive) or \
+                   not 0 < adaptive[0] <= adaptive[1]:
+                    raise ValueError('`adaptive` should be True or a (min_delay, max_delay) pair of positive numbers.')
+                adaptive = tuple(adaptive)
             else:
-                self.delay = default_delay
+                adaptive = None
 
             if style is not None:
                 style1 = style
@@ -189,151 +508,398 @@ class BusyPal:
             if frames is not None:
                 frames1 = frames
 
-            if '{spinner}' in self.fmt:
-                self.fmt = self.fmt.replace('{spinner}', '{spinner1}')
+            if '{spinner}' in fmt:
+                fmt = fmt.replace('{spinner}', '{spinner1}')
 
-            if '{spinner1}' in self.fmt:
-                if isinstance(style1, dict):
-                    style_id1 = style1['id'] if 'id' in style1 else default_style_id
-                    frames1 = style1['frames'] if 'frames' in style1 else None
-                    color1 = style1['color'] if 'color' in style1 else None # DARK_ORANGE
-                    typeface1 = style1['typeface'] if 'typeface' in style1 else 'RESET'
-                else:
-                    if style1 is not None and not isinstance(style1, (int,str,list,tuple)):
-                        raise ValueError('styles only accept dictionaries, strings, list, tuples and integers')
-                    style1 = style1 if style1 is not None else default_style_id
-                    color1 = None
-                    typeface1 = 'RESET'
-                    if isinstance(style1, (str,list,tuple)):
-                        frames1 = style1
-                    else:
-                        style_id1 = style1
-                self.spinner1 = frames1 if frames1 is not None else anim[style_id1]
-                self.spinner1_generator = self.generate_spin(self.spinner1,color1,typeface1)
-
-            if '{spinner2}' in self.fmt:
-                if isinstance(style2, dict):
-                    style_id2 = style2['id'] if 'id' in style2 else default_style_id
-                    frames2 = style2['frames'] if 'frames' in style2 else None
-                    color2 = style2['color'] if 'color' in style2 else None # DARK_ORANGE
-                    typeface2 = style2['typeface'] if 'typeface' in style2 else 'RESET'
-                else:
-                    if style2 is not None and not isinstance(style2, (int,str,list,tuple)):
-                        raise ValueError('styles only accept dictionaries, strings, list, tuples and integers')
-                    style2 = style2 if style2 is not None else default_style_id
-                    color2 = None
-                    typeface2 = 'RESET'
-                    if isinstance(style2, (str,list,tuple)):
-                        frames2 = style2
-                    else:
-                        style_id2 = style2
-                self.spinner2 = frames2 if frames2 is not None else anim[style_id2]
-                self.spinner2_generator = self.generate_spin(self.spinner2,color2,typeface2)
-
-    def animate(self):
-        while self.busy:
-            line = self.fmt
-            if '{spinner1}' in self.fmt:
-                spinner1 = next(self.spinner1_generator)
-            if '{spinner2}' in self.fmt:
-                spinner2 = next(self.spinner2_generator)
-            if 'message' in self.fmt:
-                message = self.message
-            if 'outcome' in self.fmt:
-                line = self.remove_block('outcome', line)
-            if not line.endswith(' '):
-                # - add an additional space here because sometimes the last character blinks unwantedly
-                line += ' '
-            self.line = f"\r{line.format(**locals())}"
-            sys.stdout.write(self.line)
-            sys.stdout.flush()
-            time.sleep(self.delay)
-            sys.stdout.write('\b')
-            sys.stdout.flush() ## this extra flush makes it not smooth?
+            if '{spinner1}' in fmt:
+                spinners['spinner1'] = cls.spinner_spec(style1, frames1)
+
+            if '{spinner2}' in fmt:
+                spinners['spinner2'] = cls.spinner_spec(style2, frames2)
+
+            plan = RenderPlan(fmt, message, spinners, donetext, failtext, cleanup or [])
+
+        return Config(message=message, fmt=fmt, donetext=donetext, failtext=failtext, cleanup=cleanup, delay=delay,
+                      skip=skip, show_after=show_after or None, backend=backend, adaptive=adaptive or None,
+                      unit=unit, profile=profile, profile_interval=profile_interval or delay or default_delay,
+                      stall_timeout=stall_timeout, on_stall=on_stall, stall_dump=stall_dump, non_tty=non_tty,
+                      log_interval=log_interval, redirect=redirect, sink=sink, spinners=spinners, plan=plan)
+
+    def __init__(self, message='', style=None, style1=None, style2=None, frames=None, frames1=None, frames2=None, delay=None,
+                 fmt='{spinner} {message} {outcome}', donetext='Done!', failtext='Failed!', cleanup=False, skip=0, verbose=True,
+                 show_after=None, backend='thread', adaptive=False, unit='it', profile=False, profile_interval=None,
+                 stall_timeout=None, on_stall=None, stall_dump=True, non_tty='message', log_interval=60.0, redirect=False,
+                 sink=None, total=None, workers=None, key=None, config=None):
+
+        if config is None:
+            config = self.configure(message=message, style=style, style1=style1, style2=style2, frames=frames,
+                                    frames1=frames1, frames2=frames2, delay=delay, fmt=fmt, donetext=donetext,
+                                    failtext=failtext, cleanup=cleanup, skip=skip, verbose=verbose, show_after=show_after,
+                                    backend=backend, adaptive=adaptive, unit=unit, profile=profile,
+                                    profile_interval=profile_interval, stall_timeout=stall_timeout, on_stall=on_stall,
+                                    stall_dump=stall_dump, non_tty=non_tty, log_interval=log_interval, redirect=redirect,
+                                    sink=sink)
+
+        # - everything below is the per-invocation state, the rest lives in the (shared) config
+        self.config = config
+        self.message = config.message
+        self.delay = config.delay
+        self.plan = config.plan
+        self.show_after = config.show_after
+        self.backend = config.backend
+        self.adaptive = config.adaptive
+        self.helper = None
+        self.notebook = None # - the `display` output of a region drawn by the notebook backend
+        self.loop = None # - the event loop driving the animation of an `async with` region
+        self.profiler = None
+        self.stalled = False
+        self.dumped = False
+        self.frames = 0
+        self.render_time = 0.0
+        self.stats = None
+        self.count = 0 # - bump it as the work progresses to feed the {count}, {rate} and {eta} fields
+        self.total = total
+        self.key = key or config.message # - what the timings of this region are recorded under
+        self.rate = None
+        self.sample = None
+        if workers is None or hasattr(workers, 'claim'):
+            self.board = workers
+        else:
+            # - the workers report into this block of shared memory (see `busypal.progress`)
+            from .progress import Board
+            self.board = Board(workers)
+        self.pending = None
+        self.shown = False
+        self.logged = False # - heartbeat lines instead of the animation (see `non_tty`)
+        self.drawn = False  # - whether the renderer is drawing this region right now (see `write`)
+        self.messages = deque()
+        self.partial = ''
+        self.redirected = None
+
+        skip = self.skip = config.skip
+
+        if (skip==0 or not skip) and not session.viewedonscreen():
+            self.skip = 1 # it does not show the animation part at least
+            self.logged = config.non_tty != 'message'
+            
+        if skip<0:
+            self.skip = 0 # it does not skip under any circumstances
+
+        if silenced or getattr(local, 'silenced', False):
+            self.skip = 2 # - a pool worker (see `silence`) has no business drawing on the parent's terminal
+
+        if skip==0 and 'multiprocessing' in sys.modules and not session.isparent():
+            # - same goes for any other child process (which would have imported multiprocessing by now):
+            #   it reports through `busypal.report` instead
+            self.skip = 2
 
     def __enter__(self):
         self.busy = True
         if not self.skip:
-            # - thread.daemon=True causes the thread to terminate when the main process ends
-            threading.Thread(target=self.animate, daemon=True).start()
+            self.plan.compile()
+        if self.config.sink is None and isinstance(sys.stdout, Redirect):
+            self.stream = sys.stdout.pal.stream # - nested in a redirecting region: draw where it draws
+        else:
+            self.stream = sinks.resolve(self.config.sink)
+        if self.config.redirect:
+            self.redirect()
+        # - regions entered from the same thread (or asyncio task) while another one is live are nested in it
+        if self.loop is None:
+            self.thread_id = threading.get_ident()
         else:
-            # *** don't output anything - neigther the message (even if provided) nor the animation - if:
-            #       * `skip` is explicitely set to something more than 1 (which can be 2)
-            # *** otherwise just skip the animation part and write the message if:
-            #       * `skip` is explicitely set to 1
-            #                  - or -
-            #       * the output is not being viewed on the screen (i.e. redirected to a file or something)
-            if self.skip == 1:
-                if self.message!='':
-                    sys.stdout.write(f'{self.message}\n')
+            import asyncio
+            self.thread_id = id(asyncio.current_task(self.loop))
+        self.ident = threading.get_ident()
+        self.started = time.monotonic()
+        self.cpu_started = time.thread_time()
+        self.progress, self.last_progress = None, self.started
+        if self.config.profile and self.loop is None:
+            # - an async region shares its thread with the event loop, so there is nothing to sample there
+            from .profiler import Profiler
+            self.profiler = Profiler(self.thread_id, self.config.profile_interval)
+        # - checked on by the renderer thread whether shown or not (see `watch`)
+        self.watched = self.profiler is not None or self.config.stall_timeout is not None
+        if self.board is not None:
+            from . import progress
+            progress.push(self.board)
+        renderer.add(self, self.show_after if self.skip <= 1 else None)
+        return self
 
     def __exit__(self, exception, value, traceback):
+        self.busy = False
+        if self.redirected is not None:
+            self.restore()
+        wall, cpu = time.monotonic()-self.started, time.thread_time()-self.cpu_started
+        # - a generator closed before the end, i.e. a loop over `busy_iter` left early: neither done nor failed
+        stopped = exception is not None and issubclass(exception, GeneratorExit)
+        failed = exception is not None and not stopped
+        if self.board is not None:
+            from . import progress
+            progress.pop(self.board)
         if self.skip:
-            if exception is not None:
-                return False
+            renderer.remove(self, self.log_line(time.monotonic(), failed) if self.logged else None)
         else:
-            self.busy = False
-            #time.sleep(self.delay)
-            if self.cleanup is True:
-                blank = ' ' * len(self.line) # overwrite with blank
-                sys.stdout.write(f"\r{blank}\r")
-                sys.stdout.flush()
-                if exception is not None:
-                    return False
+            values = self.values(time.monotonic(), final=True) if self.plan.live else None
+            renderer.remove(self, self.plan.final(failed, values, stopped), newline=not failed)
+        # - once `remove` returns no other frame can be written, so the outcome above is the last word
+        if self.profiler is not None:
+            if isinstance(self.config.profile, str):
+                self.profiler.write(self.config.profile)
             else:
-                if self.cleanup is False:
-                    self.cleanup = ['']
-                if exception is not None:
-                    if 'spinner1' in self.fmt:
-                        if 'spinner1' in self.cleanup:
-                            self.fmt = self.remove_block('spinner1', self.fmt)
-                        else:
-                            spinner1 = cl.stylize(self.spinner1[-2], cl.fg('red')+cl.attr('bold'))
-                    if 'spinner2' in self.fmt:
-                        if 'spinner2' in self.cleanup:
-                            self.fmt = self.remove_block('spinner2', self.fmt)
-                        else:
-                            spinner2 = cl.stylize(self.spinner2[-2], cl.fg('red')+cl.attr('bold'))
-                    if 'message' in self.fmt:
-                        if 'message' in self.cleanup:
-                            self.fmt = self.remove_block('message', self.fmt)
-                        else:
-                            message = self.message
-                    if 'outcome' in self.fmt:
-                        if 'outcome' in self.cleanup:
-                            self.fmt = self.remove_block('outcome', self.fmt)
-                        else:
-                            outcome = stylized_fail(self.failtext)
-                    fail = self.fmt.format(**locals()).lstrip()
-                    blank = ' ' * (len(self.line)-len(fail)) # overwrite excess existing characters with blank
-                    sys.stdout.write(f'\r{fail+blank}')
-                    time.sleep(self.delay) # avoiding race condition (just in case)
-                    return False
-                else:
-                    if 'spinner1' in self.fmt:
-                        if 'spinner1' in self.cleanup:
-                            self.fmt = self.remove_block('spinner1', self.fmt)
-                        else:
-                            spinner1 = cl.stylize(self.spinner1[-1], cl.fg('green')+cl.attr('bold'))
-                    if 'spinner2' in self.fmt:
-                        if 'spinner2' in self.cleanup:
-                            self.fmt = self.remove_block('spinner2', self.fmt)
-                        else:
-                            spinner2 = cl.stylize(self.spinner2[-1], cl.fg('green')+cl.attr('bold'))
-                    if 'message' in self.fmt:
-                        if 'message' in self.cleanup:
-                            self.fmt = self.remove_block('message', self.fmt)
-                        else:
-                            message = self.message
-                    if 'outcome' in self.fmt:
-                        if 'outcome' in self.cleanup:
-                            self.fmt = self.remove_block('outcome', self.fmt)
-                        else:
-                            outcome = stylized_done(self.donetext)
-                    done = self.fmt.format(**locals()).lstrip()
-                    blank = ' ' * (len(self.line)-len(done)) # overwrite excess existing characters with blank
-                    sys.stdout.write(f'\r{done+blank}\n')
-                    time.sleep(self.delay) # avoiding race condition (just in case)
+                sys.stderr.write(self.profiler.summary())
+        duration = time.monotonic() - self.shown_at if self.frames else 0.0
+        if self.frames:
+            self.stats = {'frames': self.frames, 'fps': self.frames/duration if duration else 0.0,
+                          'render_time': self.render_time, 'delay': self.delay}
+        if timing.enabled:
+            # - after `remove`, so that the frames are all counted
+            timing.timings.record(self.key, wall, cpu, failed, self.frames, duration, self.render_time)
+        return False
+
+    async def __aenter__(self):
+        import asyncio
+        self.loop = asyncio.get_running_loop()
+        return self.__enter__()
+
+    async def __aexit__(self, exception, value, traceback):
+        return self.__exit__(exception, value, traceback)
+
+    def render(self, now):
+        ''' The line of the current frame '''
+        return self.plan.line(self.tick, self.values(now) if self.plan.live else None, self.stalled)
+
+    def write(self, text, end='\n'):
+        '''
+        Writes `text` out without colliding with the spinner, like `tqdm.write`: while the region is
+        drawn, it is queued (no lock, no syscall) and written above the live lines with the next frame.
+        '''
+        self.messages.append(text + end)
+        if self.drawn:
+            return
+        # - not drawn (anymore): straight to the stream, along with anything that missed the last drain
+        stream = self.stream if hasattr(self, 'stream') else sinks.resolve(self.config.sink)
+        while self.messages:
+            try:
+                stream.write(self.messages.popleft())
+            except IndexError:
+                break
+        renderer.invalidate() # - for the other regions drawn there, if any
+
+    def drain(self, flush=False):
+        ''' The complete lines queued by `write` so far (and the incomplete last one if `flush`) '''
+        messages = self.messages
+        if not messages and not (flush and self.partial):
+            return ''
+        chunks = [self.partial]
+        while messages:
+            chunks.append(messages.popleft())
+        text = ''.join(chunks)
+        if flush:
+            self.partial = ''
+            return text if not text or text.endswith('\n') else text + '\n'
+        head, newline, self.partial = text.rpartition('\n')
+        return head + newline
+
+    def redirect(self):
+        '''
+        Routes `sys.stdout` and `sys.stderr`, those of them that write where the region draws, as well
+        as the logging handlers writing to them through `write` for as long as the region is live.
+        '''
+        self.redirected = Redirect(self)
+        redirects.push(self.redirected)
+
+    def restore(self):
+        redirects.pop(self.redirected)
+        self.redirected = None
+
+    def log_line(self, now, failed=None):
+        ''' A heartbeat line of a region logged with `non_tty`, or its outcome line if `failed` is given '''
+        elapsed = now - self.started
+        count = self.count + (self.board.total() if self.board is not None else 0)
+        counted = count or self.total is not None
+        if self.config.non_tty == 'json':
+            import json
+            record = {'time': round(time.time(), 3), 'message': self.message or self.key, 'elapsed': round(elapsed, 3)}
+            if failed is not None:
+                record['outcome'] = 'failed' if failed else 'done'
+            if counted:
+                record.update(count=count, total=self.total, rate=round(count/elapsed, 3) if elapsed > 0 else None)
+            return json.dumps(record) + '\n'
+        duration = f'{elapsed:.1f}s' if elapsed < 60 else format_duration(elapsed)
+        if failed is None:
+            text = f'{self.message or self.key} busy for {duration}'
+        else:
+            text = f'{self.message or self.key} {self.config.failtext if failed else self.config.donetext} in {duration}'
+        if counted:
+            total = '' if self.total is None else f'/{self.total}'
+            text += f' ({count}{total} {self.config.unit}, {format_rate(count/elapsed if elapsed > 0 else 0.0, self.config.unit)})'
+        return text + '\n'
+
+    def watch(self, now):
+        '''
+        Called by the renderer thread while the region is profiled, has a `stall_timeout` (even if it
+        is not shown) or live fields to send to a notebook. Returns when it wants to be called next.
+        '''
+        due = now + 3600
+        if self.profiler is not None:
+            if self.sample_due <= now:
+                self.profiler.sample()
+                self.sample_due = max(self.sample_due+self.profiler.interval, now)
+            due = self.sample_due
+        if self.config.stall_timeout is not None:
+            self.check_stall(now)
+            due = min(due, now + min(self.config.stall_timeout/4, 1.0))
+        if self.notebook is not None and self.plan.live:
+            if self.notebook.due <= now:
+                self.notebook.due = self.notebook.update(now)
+            due = min(due, self.notebook.due)
+        return due
+
+    def check_stall(self, now):
+        '''
+        Any heartbeat, `count` bump or worker report counts as progress. A region that made none for
+        `stall_timeout` seconds is drawn with the stalled frames, dumps the stacks of all threads
+        (once) and calls `on_stall` with itself (once per stall, from the renderer thread, so keep it short).
+        '''
+        progress = (self.count, beats.get(self.ident))
+        if self.board is not None:
+            progress += (self.board.total(), max(self.board.beats))
+        if progress != self.progress:
+            if self.progress is not None:
+                self.last_progress = now
+            self.progress, self.stalled = progress, False
+        elif not self.stalled and now-self.last_progress > self.config.stall_timeout:
+            self.stalled = True
+            if self.config.stall_dump and not self.dumped:
+                self.dumped = True
+                header = f'\nbusypal: {self.key!r} made no progress for {now-self.last_progress:.1f} s, stacks of all threads:\n'
+                try:
+                    if isinstance(self.config.stall_dump, str):
+                        with open(self.config.stall_dump, 'a') as file:
+                            file.write(header)
+                            dump_stacks(file)
+                    else:
+                        sys.stderr.write(header)
+                        dump_stacks(sys.stderr)
+                except Exception:
+                    report_error(f'could not dump the stacks of the threads for {self.key!r}')
+                renderer.invalidate() # - the lines drawn in the meantime are no longer where we left them
+            if self.config.on_stall is not None:
+                try:
+                    self.config.on_stall(self)
+                except Exception:
+                    # - it runs on the renderer thread, which has every other region to draw
+                    report_error(f'the `on_stall` callback of {self.key!r} failed')
+
+    def values(self, now, final=False):
+        '''
+        The values of the live fields at `now`. The rate is smoothed over the frames, which is where
+        it gets sampled, so that the work itself only has to bump `count`.
+        '''
+        count, total, elapsed = self.count, self.total, now-self.started
+        if self.board is not None:
+            count += self.board.total()
+        if final or self.sample is None:
+            rate = count/elapsed if elapsed > 0 else 0.0
+        else:
+            last_count, last_time = self.sample
+            rate = (count-last_count)/(now-last_time) if now > last_time else self.rate
+            rate = rate if self.rate is None else 0.3*rate + 0.7*self.rate
+        if not final:
+            self.rate, self.sample = rate, (count, now)
+        if total is None or not rate:
+            eta = '?'
+        else:
+            eta = format_duration(max(total-count, 0)/rate)
+        return {'count': count, 'total': '?' if total is None else total, 'rate': format_rate(rate, self.config.unit),
+                'eta': eta, 'elapsed': format_duration(elapsed), 'workers': '' if self.board is None else self.board.workers()}
+
+    def pace(self, lateness, load):
+        '''
+        Stretches the frame interval of an `adaptive` region within its (min_delay, max_delay) bounds
+        when the renderer wakes up late (GIL/CPU contention) or the CPU `load` (0 to 1) is high, and
+        brings it back down once the pressure is off.
+        '''
+        low, high = self.adaptive
+        pressure = max(min(lateness/self.delay, 1.0), 2*load-1.0, 0.0)
+        self.delay = max(low, min(high, 0.7*self.delay + 0.3*(low + (high-low)*pressure)))
+
+class Redirect:
+    ' A file-like stand-in for `sys.stdout`/`sys.stderr` that writes through `BusyPal.write` '
+
+    def __init__(self, pal):
+        self.pal = pal
+
+    def write(self, text):
+        self.pal.write(text, end='')
+        return len(text)
+
+    def flush(self):
+        pass # - the renderer flushes with the next frame
+
+    def __getattr__(self, name):
+        # - encoding, isatty(), fileno()... of the sink, and whatever it lacks (e.g. `buffer`) of the stream behind it
+        sink = self.pal.stream
+        if not hasattr(sink, name) and hasattr(sink, 'stream'):
+            return getattr(sink.stream, name)
+        return getattr(sink, name)
+
+class Redirects:
+    '''
+    The stack of the live regions with `redirect=True`, whichever order they exit in (e.g. from
+    different threads): `sys.stdout`, `sys.stderr` and the logging handlers writing to them always
+    go to the most recent one still live, and back to where they went before once none is left.
+    Streams swapped for something else in the meantime (e.g. by `contextlib.redirect_stdout`) are
+    left alone.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stack = []        # (Redirect, whether it takes sys.stdout, whether it takes sys.stderr)
+        self.originals = None  # (sys.stdout, sys.stderr, {handler: its stream}) from before the first one
+
+    def push(self, redirect):
+        with self.lock:
+            if not self.stack:
+                self.originals = (sys.stdout, sys.stderr, {})
+            # - e.g. with `sink='stderr'`, print() keeps going to stdout
+            stdout, stderr = (sinks.reaches(redirect.pal.stream, stream) for stream in self.originals[:2])
+            self.stack.append((redirect, stdout, stderr))
+            if 'logging' in sys.modules: # - no need to import it if nobody logs anything
+                import logging
+                targets = [stream for stream, taken in zip(self.originals, (stdout, stderr)) if taken]
+                loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                                   if isinstance(logger, logging.Logger)]
+                for logger in loggers:
+                    for handler in logger.handlers:
+                        if type(handler) is logging.StreamHandler and handler.stream in targets:
+                            self.originals[2][handler] = handler.stream
+            self.apply()
+
+    def pop(self, redirect):
+        with self.lock:
+            self.stack = [entry for entry in self.stack if entry[0] is not redirect]
+            self.apply()
+            if not self.stack:
+                self.originals = None
+
+    def apply(self):
+        stdout, stderr, handlers = self.originals
+        latest = {stdout: stdout, stderr: stderr}
+        for redirect, takes_stdout, takes_stderr in self.stack:
+            if takes_stdout:
+                latest[stdout] = redirect
+            if takes_stderr:
+                latest[stderr] = redirect
+        if sys.stdout is stdout or isinstance(sys.stdout, Redirect):
+            sys.stdout = latest[stdout]
+        if sys.stderr is stderr or isinstance(sys.stderr, Redirect):
+            sys.stderr = latest[stderr]
+        for handler, stream in handlers.items():
+            if handler.stream is stream or isinstance(handler.stream, Redirect):
+                handler.setStream(latest[stream])
+
+redirects = Redirects()
 
 # function from: https://stackoverflow.com/a/62314128/11560784
 def omittable_parentheses_decorator(decorator):
@@ -373,15 +939,109 @@ def omittable_parentheses_decorator(decorator):
 @omittable_parentheses_decorator
 def busy(message='', style=None, style1=None, style2=None, frames=None,
          frames1=None, frames2=None, delay=None,fmt='{spinner} {message} {outcome}',
-         donetext='Done!', failtext='Failed!', cleanup=False, skip=0, *args, **kwargs):
+         donetext='Done!', failtext='Failed!', cleanup=False, skip=0, show_after=None, backend='thread', adaptive=False,
+         profile=False, profile_interval=None, stall_timeout=None, on_stall=None, stall_dump=True, non_tty='message',
+         log_interval=60.0, redirect=False, sink=None, workers=None, *args, **kwargs):
+    # - everything that only depends on the arguments above is worked out once, here
+    config = BusyPal.configure(message=message, style=style, style1=style1, style2=style2, frames=frames,
+                               frames1=frames1, frames2=frames2, delay=delay, fmt=fmt, donetext=donetext,
+                               failtext=failtext, cleanup=cleanup, skip=skip, show_after=show_after, backend=backend,
+                               adaptive=adaptive, profile=profile, profile_interval=profile_interval,
+                               stall_timeout=stall_timeout, on_stall=on_stall, stall_dump=stall_dump, non_tty=non_tty,
+                               log_interval=log_interval, redirect=redirect, sink=sink)
     def decorator(func):
+        key = f'{func.__module__}.{func.__qualname__}'
+        # - CO_COROUTINE, as `inspect.iscoroutinefunction` would tell for the price of importing inspect (and ast, dis, re...)
+        if getattr(getattr(func, '__code__', None), 'co_flags', 0) & 0x80:
+            # - the spinner has to last as long as the awaited work, not just the creation of the coroutine
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                async with BusyPal(config=config, workers=workers, key=key):
+                    result = await func(*args, **kwargs)
+                return result
+            return wrapper
         @wraps(func)
         def wrapper(*args, **kwargs):
-            with BusyPal(message=message, style=style, style1=style1, style2=style2, frames=frames,
-                         frames1=frames1, frames2=frames2, delay=delay,fmt=fmt,
-                         donetext=donetext, failtext=failtext, cleanup=cleanup, skip=skip):
+            with BusyPal(config=config, workers=workers, key=key):
                 result = func(*args, **kwargs)
             return result
         return wrapper
     return decorator
 
+
+def busy_iter(iterable, message='', total=None, per_item=1, fmt=None, **kwargs):
+    '''
+    Yields the items of `iterable` while a BusyPal line shows how many of them went through, how
+    fast and, if `total` is known (or `iterable` has a length), how long it is going to take.
+    All it costs per item is an integer increment: the rate and the ETA are worked out by the
+    renderer thread at each frame. With batched iteration, where each item stands for several
+    units of work, `per_item` is either that number or a function of the item (e.g. `len`).
+    Any other keyword argument goes to BusyPal (e.g. `unit`, `style`, `delay`).
+
+    >>> for row in busy_iter(read_rows(path), 'Reading'):
+    ...     process(row)
+    >>> for batch in busy_iter(batches, 'Training', total=n_samples, per_item=len, unit=' samples'):
+    ...     fit(batch)
+
+    A plain loop can't tell a `break` from an exception raised in its body: either way the region
+    ends as stopped (neither done nor failed, and not counted as a failure in `busypal.timings`)
+    unless `iterable` was exhausted. In a `with` block, the region sees the exception (if any) and
+    leaving the loop early is done:
+
+    >>> with busy_iter(read_rows(path), 'Searching') as rows:
+    ...     for row in rows:
+    ...         if match(row):
+    ...             break
+    '''
+    if total is None and per_item == 1:
+        try:
+            total = len(iterable)
+        except TypeError:
+            pass # - a generator or something else of unknown length
+    if fmt is None:
+        if total is None:
+            fmt = '{spinner} {message} {count} [{elapsed}, {rate}] {outcome}'
+        else:
+            fmt = '{spinner} {message} {count}/{total} [{elapsed}<{eta}, {rate}] {outcome}'
+    return BusyIter(iterable, per_item, BusyPal(message, fmt=fmt, total=total, **kwargs))
+
+class BusyIter:
+    ' What `busy_iter` returns: iterated over, within a `with` block or not '
+
+    def __init__(self, iterable, per_item, pal):
+        self.iterable = iterable
+        self.per_item = per_item
+        self.pal = pal
+        self.entered = False
+
+    def __enter__(self):
+        self.pal.__enter__()
+        self.entered = True
+        return self
+
+    def __exit__(self, exception, value, traceback):
+        self.entered = False
+        return self.pal.__exit__(exception, value, traceback)
+
+    def __iter__(self):
+        return self.items() if self.entered else self.region()
+
+    def region(self):
+        # - closed before the end (GeneratorExit), the region ends as stopped
+        with self.pal:
+            yield from self.items()
+
+    def items(self):
+        pal, per_item = self.pal, self.per_item
+        if per_item == 1:
+            for item in self.iterable:
+                yield item
+                pal.count += 1
+        elif callable(per_item):
+            for item in self.iterable:
+                yield item
+                pal.count += per_item(item)
+        else:
+            for item in self.iterable:
+                yield item
+                pal.count += per_item
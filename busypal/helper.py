@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+The out-of-process renderer behind `BusyPal(backend='process')`.
+
+The animation is drawn by a small helper interpreter (this very file run as a script, using the
+standard library only) which writes straight to the file descriptor of the parent's output stream.
+The parent sends it the precompiled render plan once and the final line at the end through a pipe,
+so while the region is busy the worker pays nothing at all: no render thread competing for the GIL,
+and the spinner keeps moving even while a C extension holds the GIL for minutes.
+'''
+
+import os
+import sys
+import pickle
+import threading
+
+def spawn(pal):
+    '''
+    Starts a helper process drawing `pal` and returns it, or None if the output stream of `pal`
+    is not backed by a file descriptor (e.g. an in-memory stream) so that a helper can't reach it.
+    '''
+    import subprocess
+    try:
+        fd = pal.stream.fileno()
+    except (AttributeError, ValueError, OSError): # io.UnsupportedOperation is an OSError/ValueError
+        return None
+    pal.stream.flush() # - whatever the parent has buffered must come out before the helper starts drawing
+    plan = pal.plan
+    state = {
+        'parts': plan.parts,
+        'slots': plan.slots,
+        'delay': pal.delay,
+        'encoding': getattr(pal.stream, 'encoding', None) or 'utf-8',
+    }
+    # - `-I -S`: the helper only needs the standard library, so skip site-packages and the environment
+    process = subprocess.Popen([sys.executable, '-I', '-S', os.path.abspath(__file__)],
+                               stdin=subprocess.PIPE, stdout=fd, close_fds=True)
+    pickle.dump(state, process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+    process.stdin.flush()
+    return process
+
+def finish(process, final, newline):
+    ''' Asks the helper to write the `final` line (blank it out if None) and waits until it is gone '''
+    try:
+        pickle.dump((final, newline), process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+        process.stdin.close()
+    except (BrokenPipeError, OSError):
+        pass # - the helper is already gone (e.g. killed), nothing left to finish
+    process.wait()
+
+def main():
+    stdin = sys.stdin.buffer
+    state = pickle.load(stdin)
+    parts, slots, delay, encoding = state['parts'], state['slots'], state['delay'], state['encoding']
+    stopped = threading.Event()
+    final = []
+
+    def listen():
+        try:
+            final.append(pickle.load(stdin))
+        except (EOFError, pickle.UnpicklingError):
+            pass # - the parent went away without saying goodbye
+        stopped.set()
+
+    threading.Thread(target=listen, daemon=True).start()
+
+    def write(text):
+        os.write(1, text.encode(encoding, 'replace'))
+
+    line, tick = '', 0
+    while True:
+        frame = parts.copy()
+        for index, frames in slots:
+            frame[index] = frames[tick % len(frames)]
+        line = ''.join(frame)
+        tick += 1
+        write('\r' + line)
+        if stopped.wait(delay):
+            break
+
+    if final:
+        text, newline = final[0]
+        if text is None:
+            write('\r' + ' '*len(line) + '\r') # overwrite with blank
+        else:
+            blank = ' ' * (len(line)-len(text)) # overwrite excess existing characters with blank
+            write('\r' + text + blank + ('\n' if newline else ''))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+The Jupyter renderer behind `BusyPal(backend='notebook')`, which is picked automatically in a
+notebook unless another backend or sink is asked for.
+
+A `\\r` frame printed by the kernel travels to the browser as a stream message over ZMQ, about eight
+per second per spinner. Here each region gets a single `display` output instead, whose spinners are
+animated by the browser itself with CSS keyframes: the kernel sends one message when the region is
+shown, one at the end with the outcome and, only if `fmt` has live fields such as {count} or
+{elapsed}, one update every `update_interval` seconds in between.
+
+`display` is the only entry point into IPython. Swap it for a stand-in to try this without a kernel:
+it takes a mime bundle (a dict such as {'text/html': ..., 'text/plain': ...}) and returns a handle
+whose `update` takes the next one.
+'''
+
+import time
+import itertools
+from html import escape
+
+update_interval = 1.0 # seconds between the updates of a line with live fields
+counter = itertools.count()
+
+def display(bundle):
+    from IPython.display import display as ipython_display
+    handle = ipython_display(bundle, raw=True, display_id=True)
+    return Handle(handle)
+
+class Handle:
+    ' The IPython DisplayHandle of a line, with `update` taking a mime bundle like `display` '
+
+    def __init__(self, handle):
+        self.handle = handle
+
+    def update(self, bundle):
+        self.handle.update(bundle, raw=True)
+
+def css_string(text):
+    # - every character as a CSS escape, so that no frame can close the string or the <style> element
+    return '"' + ''.join(f'\\{ord(char):x} ' for char in text) + '"'
+
+def css_style(color, typeface):
+    ' The CSS equivalent of the color and typeface of a spinner, as far as names go '
+    if isinstance(color, str):
+        color = {'fore': color}
+    rules = [f'{"background-color" if key == "back" else "color"}:{value.replace("_", "").lower()}'
+             for key, value in (color or {}).items()]
+    if typeface and typeface.upper() == 'BOLD':
+        rules.append('font-weight:bold')
+    return ';'.join(rules)
+
+class NotebookLine:
+    ' The `display` output of one region '
+
+    def __init__(self, pal):
+        from .busypal import compile_template, live_fields
+        self.pal = pal
+        self.id = f'busypal-{next(counter)}'
+        styles, spans = [], {}
+        for key, (frames, color, typeface) in pal.config.spinners.items():
+            frames = frames[:-2] # - the last two are the done/fail glyphs
+            name = f'{self.id}-{key}'
+            steps = ''.join(f'{100*i/len(frames):.3f}%{{content:{css_string(frame)}}}' for i, frame in enumerate(frames))
+            styles.append(f'@keyframes {name}{{{steps}}}'
+                          f'.{name}::after{{content:{css_string(frames[0])};animation:{name} {len(frames)*pal.delay:.3f}s step-end infinite;'
+                          f'{css_style(color, typeface)}}}')
+            spans[key] = (f'<span class="{name}"></span>',)
+        self.style = '<style>' + ''.join(styles) + '</style>'
+        self.parts, slots, self.fields = compile_template(pal.plan.template, {'message': escape(pal.message)}, spans,
+                                                          live_fields, escape=escape)
+        for index, frames in slots:
+            self.parts[index] = frames[0]
+        self.html = self.render(pal.values(pal.started) if pal.plan.live else None)
+        self.handle = display({'text/html': self.html, 'text/plain': pal.message})
+        self.due = time.monotonic() + update_interval
+
+    def render(self, values):
+        parts = self.parts.copy()
+        if self.fields:
+            from .busypal import fill
+            fill(parts, self.fields, {name: escape(value) if isinstance(value, str) else value for name, value in values.items()})
+        return f'{self.style}<div style="font-family:monospace;white-space:pre">{"".join(parts)}</div>'
+
+    def update(self, now):
+        ' Sends the live fields as of `now`, if they changed; returns when it wants to be called next '
+        html = self.render(self.pal.values(now))
+        if html != self.html:
+            self.html = html
+            self.handle.update({'text/html': html, 'text/plain': self.pal.message})
+        return now + update_interval
+
+    def finish(self, final):
+        # - as plain text, which the notebook shows with the colors of its ANSI escapes
+        self.handle.update({'text/plain': '' if final is None else final})
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Runs a function over many inputs in a thread or process pool behind a single BusyPal line.
+
+>>> from busypal import busy_map
+>>> results = busy_map(simulate, seeds, 'Simulating', executor='process', chunksize=16)
+⠹ Simulating 1312/10000 [00:42<04:38, 31.2it/s]
+'''
+
+import os
+from .busypal import BusyPal, silence
+from . import progress
+
+def run_chunk(func, chunk, reported=True, board=None):
+    # - a thread of an in-process pool is told which board to report into, a pool process has its own
+    previous = progress.use(board) if board is not None else None
+    try:
+        results = []
+        for item in chunk:
+            results.append(func(item))
+            if reported:
+                progress.report()
+        return results
+    finally:
+        if reported:
+            progress.idle() # - until its next chunk, if any, this worker is not stalled but out of work
+        if board is not None:
+            progress.use(previous)
+
+def init_worker(board):
+    silence()
+    progress.attach(board)
+
+def busy_map(func, iterable, message='', executor='thread', max_workers=None, chunksize=1, ordered=True, fmt=None, **kwargs):
+    '''
+    Calls `func` on every item of `iterable` in a `concurrent.futures` pool and returns the list of
+    results, in the order of `iterable` if `ordered` or else in the order they complete. A single
+    BusyPal line shows how many items are done, out of how many, and how fast.
+
+    `executor` is either 'thread', 'process' or an Executor instance of your own (which is left
+    running). Items are sent to the workers `chunksize` at a time, which is what makes process
+    pools worthwhile for cheap `func`s. The workers of the pools created here never draw spinners
+    of their own, even if `func` uses BusyPal, and report every item they get through to the
+    parent's line as they go (see `busypal.progress`), so a `{workers}` field in `fmt` shows how
+    many of them are alive, idle or stalled. `func` may call `busypal.report(0, status)` itself but must
+    not count items on its own. If `func` raises, the pending work is cancelled, the
+    line ends with the fail text and the exception propagates. Any other keyword argument goes to
+    BusyPal.
+    '''
+    from concurrent import futures
+
+    if chunksize < 1:
+        raise ValueError('`chunksize` should be a positive integer.')
+
+    items = list(iterable)
+    chunks = [items[i:i+chunksize] for i in range(0, len(items), chunksize)]
+
+    board = progress.Board(max_workers or min(32, (os.cpu_count() or 1)+4))
+    if executor == 'thread':
+        pool = futures.ThreadPoolExecutor(max_workers, initializer=silence, initargs=(True,))
+    elif executor == 'process':
+        pool = futures.ProcessPoolExecutor(max_workers, initializer=init_worker, initargs=(board,))
+    elif isinstance(executor, futures.Executor):
+        pool = None
+    else:
+        raise ValueError("`executor` should be 'thread', 'process' or a concurrent.futures.Executor.")
+
+    if fmt is None:
+        fmt = '{spinner} {message} {count}/{total} [{elapsed}<{eta}, {rate}] {outcome}'
+
+    # - with an executor of our own the workers count the items, otherwise we count the finished chunks
+    reported = pool is not None
+    with BusyPal(message, fmt=fmt, total=len(items), workers=board if reported else None, **kwargs) as pal:
+        submitted = {}
+        try:
+            for index, chunk in enumerate(chunks):
+                submitted[(pool or executor).submit(run_chunk, func, chunk, reported, board if executor == 'thread' else None)] = index
+            results = [None]*len(chunks) if ordered else []
+            for future in futures.as_completed(submitted):
+                chunk_results = future.result()
+                if ordered:
+                    results[submitted[future]] = chunk_results
+                else:
+                    results.extend(chunk_results)
+                if not reported:
+                    pal.count += len(chunk_results)
+        except BaseException:
+            # - don't start anything new: the region has failed (or was interrupted) already
+            for future in submitted:
+                future.cancel()
+            raise
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    return [result for chunk_results in results for result in chunk_results] if ordered else results
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+A sampling profiler riding on the renderer thread, for `BusyPal(profile=...)`.
+
+While the region is busy, the renderer thread (which wakes up regularly anyway) takes a look at
+the stack of the thread that entered the region every `profile_interval` seconds and counts the
+stacks it sees. Nothing runs in the profiled thread itself, so the overhead is bounded by the
+sampling rate. At the end the samples are either written as collapsed stacks, the input format
+of flamegraph.pl/speedscope/inferno, or summarized as the functions most often on top of the stack.
+'''
+
+import os
+import sys
+from collections import Counter
+
+class Profiler:
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter() # collapsed stack -> number of samples
+        self.labels = {}         # code object -> label, so that each one is formatted only once
+
+    def label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+        return label
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(self.label(frame.f_code))
+            frame = frame.f_back
+        if stack:
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        ' The samples as collapsed stacks, one "outermost;...;innermost count" line per stack '
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            f.write(self.collapsed())
+
+    def top(self, n=10):
+        '''
+        The `n` functions that were most often running (on top of the stack) as a list of
+        (function, self samples, total samples) tuples, total counting the samples where the
+        function was anywhere on the stack.
+        '''
+        own, total = Counter(), Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(function, count, total[function]) for function, count in own.most_common(n)]
+
+    def summary(self, n=10):
+        ' The `top` functions as a small table '
+        samples = sum(self.samples.values())
+        lines = [f'{samples} samples every {self.interval:g} s   self%   total%']
+        for function, count, total in self.top(n):
+            lines.append(f'  {function:<48} {100*count/samples:6.1f} {100*total/samples:7.1f}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Progress reports from worker processes (or threads) to the parent's spinner through shared memory.
+
+The parent's BusyPal owns a Board: a few shared arrays with one slot per worker holding its pid,
+how much it has done, when it last reported and a short status text. Workers call `report()`,
+which claims a slot the first time (under a lock, once per worker) and from then on just writes
+into it, without any lock, queue or message round-trip. The parent reads the whole board at each
+frame to show the aggregate count and which workers are alive, idle (they called `idle()` after
+their last report, e.g. between two chunks of work) or stalled (no report for `stall_after` seconds
+while at work). The slots of worker processes that exited are handed out again.
+
+>>> with BusyPal('Crunching', fmt='{spinner} {message} {count} done, {workers} {outcome}', workers=8) as pal:
+...     with multiprocessing.Pool(8, initializer=busypal.progress.attach, initargs=(pal.board,)) as pool:
+...         pool.map(crunch, chunks) # crunch() calls busypal.report() for every item it gets through
+
+With the `fork` start method the workers inherit the board anyway, so the initializer is optional.
+With another start method than the default one, create the board yourself, e.g.
+`BusyPal(..., workers=Board(8, context='spawn'))`.
+
+Within a process, `report` writes into the board of the most recent live region that has one,
+whichever order the regions end in. Threads working for another region use `use(board)` to say so,
+as `busy_map` does for its thread pools.
+'''
+
+import os
+import time
+import threading
+
+status_size = 32 # bytes of status text per worker
+
+attached = None # the Board that `report` writes into in this process, unless the thread `use`s another one
+base = None     # the one `attach`ed to this process, if any
+live = []       # the boards of the live regions of this process, most recent last
+lock = threading.Lock()
+local = threading.local()
+
+class Board:
+    '''
+    The shared-memory block where up to `slots` workers report their progress. `context` is the
+    multiprocessing start method of the workers (e.g. 'spawn') if it's not the default one.
+    '''
+
+    def __init__(self, slots=None, stall_after=30.0, context=None):
+        from multiprocessing import get_context, RawArray
+        self.slots = slots or os.cpu_count() or 1
+        self.stall_after = stall_after # seconds without a report after which a worker counts as stalled
+        self.pids = RawArray('q', self.slots)
+        self.counts = RawArray('q', self.slots)
+        self.beats = RawArray('d', self.slots)
+        self.status = RawArray('c', self.slots*status_size)
+        self.active = RawArray('b', self.slots) # 1 while at work, 0 once the worker said it is `idle`
+        self.lock = get_context(context).Lock() # only taken to claim a slot
+
+    def claim(self):
+        ' Hands out a free slot to the calling worker '
+        with self.lock:
+            for slot in range(self.slots):
+                if not self.pids[slot] or exited(self.pids[slot]):
+                    # - the counts of a worker that is gone stay in its slot, only added to by the next one
+                    self.pids[slot] = os.getpid()
+                    self.beats[slot] = time.time()
+                    self.active[slot] = 1
+                    self.status[slot*status_size:(slot+1)*status_size] = bytes(status_size)
+                    return slot
+        # - more workers than slots: share one (reports may then occasionally get lost)
+        return os.getpid() % self.slots
+
+    def total(self):
+        return sum(self.counts)
+
+    def state(self, slot, now):
+        ''' What the worker in `slot` is up to: None (no worker), 'alive', 'idle', 'stalled' or 'exited' '''
+        pid = self.pids[slot]
+        if not pid:
+            return None
+        if exited(pid):
+            return 'exited'
+        if not self.active[slot]:
+            return 'idle'
+        return 'stalled' if now-self.beats[slot] > self.stall_after else 'alive'
+
+    def workers(self):
+        ' A summary of the workers, e.g. "6 alive, 1 idle, 1 stalled" '
+        now, states = time.time(), {'alive': 0, 'idle': 0, 'stalled': 0, 'exited': 0, None: 0}
+        for slot in range(self.slots):
+            states[self.state(slot, now)] += 1
+        return ', '.join([f'{states["alive"]} alive'] + [f'{states[state]} {state}' for state in ('idle', 'stalled') if states[state]])
+
+    def snapshot(self):
+        ' The state of every worker that has reported so far, as a list of dicts '
+        now = time.time()
+        return [{'pid': self.pids[slot], 'count': self.counts[slot], 'idle': now-self.beats[slot], 'state': self.state(slot, now),
+                 'status': self.status[slot*status_size:(slot+1)*status_size].rstrip(b'\0').decode('utf-8', 'replace')}
+                for slot in range(self.slots) if self.pids[slot]]
+
+def exited(pid):
+    ' Whether the process `pid` is gone (never said on Windows, where there is no cheap way to tell) '
+    if pid == os.getpid() or os.name != 'posix':
+        return False
+    try:
+        os.kill(pid, 0) # - signal 0 only checks that the process is there
+    except ProcessLookupError:
+        return True
+    except OSError: # - there, but someone else's
+        return False
+    return False
+
+def attach(board):
+    ' Makes `report` write into `board` in this process; meant as a pool initializer '
+    global base, attached
+    with lock:
+        base = board
+        attached = live[-1] if live else base
+
+def push(board):
+    ' Called as a region with a board is entered '
+    global attached
+    with lock:
+        live.append(board)
+        attached = board
+
+def pop(board):
+    ' Called as a region with a board ends, whether or not those entered after it are over '
+    global attached
+    with lock:
+        for index in range(len(live)-1, -1, -1):
+            if live[index] is board:
+                del live[index]
+                break
+        attached = live[-1] if live else base
+
+def use(board):
+    ' Makes `report` write into `board` from the calling thread (back to `attached` with None); returns the previous one '
+    previous, local.target = getattr(local, 'target', None), board
+    return previous
+
+def report(n=1, status=None):
+    '''
+    Tells the parent's spinner that this worker got through `n` more items (0 is fine too, as a
+    sign of life) and optionally what it is up to. Does nothing if no board is attached.
+    '''
+    board = getattr(local, 'target', None) or attached
+    if board is None:
+        return
+    if getattr(local, 'board', None) is not board:
+        local.board, local.slot = board, board.claim()
+    slot = local.slot
+    board.counts[slot] += n
+    board.beats[slot] = time.time()
+    board.active[slot] = 1
+    if status is not None:
+        board.status[slot*status_size:(slot+1)*status_size] = status.encode('utf-8')[:status_size].ljust(status_size, b'\0')
+
+def idle():
+    '''
+    Tells the parent's spinner that this worker is done for now, e.g. after a chunk of work: it
+    shows as idle rather than stalled until it reports again.
+    '''
+    board = getattr(local, 'target', None) or attached
+    if board is not None and getattr(local, 'board', None) is board:
+        board.active[local.slot] = 0
+
+def forget():
+    ' A forked child has to claim slots of its own rather than write into those of its parent '
+    global local, lock, live, base
+    local, lock = threading.local(), threading.Lock()
+    # - the regions live in the parent are not in here, but the board it reported into is inherited
+    live, base = [], attached
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=forget)
@@ -0,0 +1,533 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+A single process-wide renderer that owns the terminal on behalf of all the live BusyPal instances.
+
+One daemon thread draws every spinner off a single timer: it wakes up whenever the next spinner
+is due (each one keeps its own `delay`) and redraws the block of live lines of each output sink
+(see `busypal.sink`) in one pre-encoded write. A lone spinner is drawn as a plain `\\r` line, of
+which only the characters that changed since the last frame are sent to a terminal (with a full
+redraw every `resync` seconds and after any write of our own that is not a frame), while concurrent
+or nested ones are stacked as a multi-line block (nested regions indented under their parent)
+redrawn in place with cursor-movement escapes. Regions with a `show_after` grace period wait in a
+queue until they are due, so the ones that finish earlier never show up at all. Text passed to
+`BusyPal.write` while a region is drawn is queued and written out above the live lines with the
+next frame, in the same single write. Regions that are not viewed on screen may log a heartbeat
+line now and then instead (`non_tty`). Regions with
+`backend='process'` are handed over to a helper process instead (see `busypal.helper`), and those
+in a Jupyter notebook to a `display` output animated by the browser (see `busypal.notebook`).
+
+Regions entered with `async with` are not ticked by the thread at all: each event loop gets a
+single `loop.call_later` chain that ticks all of its regions, so asyncio code doesn't need any
+thread, however many of its coroutines are busy at once.
+
+A region that fails to draw (e.g. a closed stream or a raising callback) is reported
+on stderr and dropped, screen by screen and region by region, while the others keep going.
+'''
+
+import os
+import sys
+import time
+import heapq
+import itertools
+import threading
+
+CURSOR_UP = '\x1b[{}A'
+CLEAR_DOWN = '\x1b[J' # clears from the cursor to the end of the screen
+CURSOR_FORWARD = '\x1b[{}C'
+CURSOR_BACK = '\x1b[{}D'
+RESET = '\x1b[0m'
+
+resync = 1.0 # seconds between full redraws of a line otherwise only sent as what changed, in case something else wrote over it
+
+widths = {} # character -> whether it takes exactly one column
+
+def split_cells(line):
+    '''
+    Splits `line` into a list of (SGR escapes in effect, character) cells, one per column, or returns
+    None if it has anything else than SGR escapes and single-column characters (e.g. wide emojis),
+    whose columns we could not tell for sure.
+    '''
+    result, state, i, n = [], '', 0, len(line)
+    while i < n:
+        char = line[i]
+        if char == '\x1b':
+            j = i + 2
+            while j < n and not '@' <= line[j] <= '~':
+                j += 1
+            if j >= n or line[i+1] != '[' or line[j] != 'm':
+                return None
+            escape = line[i:j+1]
+            state = '' if escape in (RESET, '\x1b[m') else state + escape
+            i = j + 1
+            continue
+        narrow = widths.get(char)
+        if narrow is None:
+            import unicodedata
+            narrow = widths[char] = char.isprintable() and not unicodedata.combining(char) and \
+                                    unicodedata.east_asian_width(char) in ('N', 'Na', 'H')
+        if not narrow:
+            return None
+        result.append((state, char))
+        i += 1
+    return result
+
+def delta(old, new):
+    '''
+    The text that turns the line drawn as the cells `old` into the cells `new`: a jump to the first
+    column that changed and the cells up to the last one that did, leaving the cursor at the end of
+    `new` like a full redraw would. Empty if nothing changed.
+    '''
+    blank = ('', ' ')
+    length = max(len(old), len(new))
+    changed = [i for i in range(length) if (old[i] if i < len(old) else blank) != (new[i] if i < len(new) else blank)]
+    if not changed:
+        return ''
+    first, last = changed[0], changed[-1]
+    text, state = '\r' + (CURSOR_FORWARD.format(first) if first else ''), ''
+    for i in range(first, last+1):
+        cell_state, char = new[i] if i < len(new) else blank
+        if cell_state != state:
+            text += cell_state[len(state):] if state and cell_state.startswith(state) else RESET + cell_state
+            state = cell_state
+        text += char
+    if state:
+        text += RESET
+    if last+1 < len(new):
+        text += CURSOR_FORWARD.format(len(new)-last-1)
+    elif last+1 > len(new):
+        text += CURSOR_BACK.format(last+1-len(new)) # - over the blanks that erased the end of `old`
+    return text
+
+def notebook_wanted(pal):
+    ''' Whether `pal` is to be drawn by the notebook backend: if asked for, or by default in a notebook '''
+    if pal.backend == 'notebook':
+        return True
+    from . import session
+    return pal.backend == 'thread' and pal.config.sink is None and session.isnotebook()
+
+def report_error(what):
+    ' Reports the exception being handled on stderr, without letting it go any further '
+    import traceback
+    try:
+        sys.stderr.write(f'busypal: {what}\n' + traceback.format_exc())
+    except Exception:
+        pass # - nowhere left to report it
+    renderer.invalidate()
+
+class Screen:
+    ' The block of live lines drawn on one output sink '
+
+    def __init__(self, stream):
+        self.stream = stream # - a Sink
+        self.pals = []   # in the order they are drawn, nested regions right below their parent
+        self.height = 0  # number of lines currently drawn
+        self.stacked = False # once drawn as a block, we stick to it until the screen is empty again
+        self.cells = None # the cells of the single line on screen, if only the changes need to be sent (see `delta`)
+        self.synced = 0.0 # when that line was last drawn in full
+
+    def add(self, pal):
+        # - a region entered from a thread that already has a live region here is nested in it
+        index, pal.depth = len(self.pals), 0
+        for i, other in enumerate(self.pals):
+            if other.thread_id == pal.thread_id:
+                index, pal.depth = i+1, other.depth+1
+        self.pals.insert(index, pal)
+
+    def block(self, above=''):
+        ''' Erases the lines currently drawn, writes the lines of `above` in their place and redraws the live ones below them '''
+        if self.height > 1:
+            text = '\r' + CURSOR_UP.format(self.height-1) + CLEAR_DOWN
+        elif self.height:
+            text = '\r' + CLEAR_DOWN
+        else:
+            text = ''
+        text += above
+        text += '\n'.join(self.indented(pal) for pal in self.pals)
+        self.height = len(self.pals)
+        self.stacked = True
+        return text
+
+    @staticmethod
+    def indented(pal):
+        return '  '*(pal.depth-1) + '└ ' + pal.line if pal.depth else pal.line
+
+    def draw(self, above='', now=0.0):
+        ''' Redraws the live lines, with the lines of `above` (if any) written out once above them '''
+        if len(self.pals) == 1 and not self.stacked:
+            # - the common case: a single line that we simply overwrite, or rather only what changed in it
+            line = self.pals[0].line
+            cells = self.stream.diff and split_cells(line)
+            if cells and self.cells and not above and now-self.synced < resync:
+                text = delta(self.cells, cells)
+            else:
+                text = ('\r' + CLEAR_DOWN + above if above else '\r') + line
+                if self.stream.diff:
+                    text += CLEAR_DOWN # - whatever else is left on the line
+                self.synced = now
+            self.cells = cells
+            self.height = 1
+        else:
+            text = self.block(above)
+            self.cells = None
+        if text:
+            self.stream.send(text.encode(self.stream.encoding, 'replace'))
+
+    def finish(self, pal, final, newline, above=''):
+        ''' Takes `pal` off the screen and leaves its `final` line (if any) in its place, below the lines of `above` '''
+        self.pals.remove(pal)
+        if above and not self.pals and not self.stacked:
+            text = '\r' + CLEAR_DOWN + above + ('' if final is None else final + ('\n' if newline else ''))
+            self.height = 0
+        elif not self.pals and not self.stacked:
+            if final is None:
+                text = '\r' + ' '*len(pal.line) + '\r' # overwrite with blank
+            else:
+                blank = ' ' * (len(pal.line)-len(final)) # overwrite excess existing characters with blank
+                text = '\r' + final + blank + ('\n' if newline else '')
+            self.height = 0
+        else:
+            # - the final line goes above the live block so that the others keep on spinning below it
+            text = self.block(above + ('' if final is None else final+'\n'))
+        self.cells = None
+        self.stream.send(text.encode(self.stream.encoding, 'replace'))
+
+class Log:
+    ' The regions logging heartbeats (instead of being drawn) on one output stream, see `non_tty` '
+
+    def __init__(self, stream, interval, now):
+        self.stream = stream
+        self.interval = interval
+        self.pals = []
+        self.due = now + interval
+
+    def write(self, now):
+        # - one write for all of them, leaving out the regions that haven't been busy for a whole interval yet
+        text = ''.join(pal.log_line(now) for pal in self.pals if now-pal.started >= self.interval)
+        if text:
+            self.stream.write(text)
+            self.stream.flush()
+            renderer.invalidate() # - it may share a terminal with a screen, e.g. stdout and stderr
+        self.due += self.interval
+        if self.due <= now:
+            self.due = now + self.interval
+
+starting = object() # - the `helper` of a region whose helper process is about to be started, see `start_helpers`
+
+class Renderer:
+    ' The single thread that draws all the live BusyPal instances '
+
+    def __init__(self):
+        self.condition = threading.Condition() # guards everything below and serializes the writes
+        self.queue = []   # heap of (deadline, sequence number, BusyPal instance) waiting for `show_after`
+        self.counter = itertools.count()
+        self.screens = {} # output stream -> Screen
+        self.logs = {}    # output stream -> Log
+        self.thread = None
+        self.tickers = {} # event loop -> (wake-up time, TimerHandle) of its pending tick
+        self.watched = [] # regions checked on whether shown or not (profiling, stall watchdog), see `BusyPal.watch`
+        self.spawns = []  # regions whose helper process gets started once the lock is released
+        self.load, self.load_sampled = 0.0, None
+
+    def wake(self):
+        if self.thread is None or not self.thread.is_alive():
+            # - thread.daemon=True causes the thread to terminate when the main process ends
+            self.thread = threading.Thread(target=self.run, name='busypal-renderer', daemon=True)
+            self.thread.start()
+        else:
+            self.condition.notify()
+
+    def add(self, pal, show_after=None):
+        with self.condition:
+            if pal.watched:
+                pal.watch_due = pal.sample_due = time.monotonic()
+                self.watched.append(pal)
+                self.wake()
+            if show_after and pal.loop is not None:
+                pal.pending = pal.loop.call_later(show_after, self.launch, pal)
+            elif show_after:
+                pal.pending = (time.monotonic()+show_after, next(self.counter), pal)
+                heapq.heappush(self.queue, pal.pending)
+                if self.queue[0] is pal.pending:
+                    self.wake()
+            else:
+                self.guarded_show(pal)
+        if self.spawns:
+            self.start_helpers()
+
+    def launch(self, pal):
+        ' Shows an async region whose grace period is over '
+        with self.condition:
+            pal.pending = None
+            self.guarded_show(pal)
+
+    def guarded_show(self, pal):
+        try:
+            self.show(pal)
+        except Exception:
+            report_error(f'{pal.key!r} failed to show up')
+            self.drop(pal)
+
+    def show(self, pal):
+        pal.shown = True
+        if pal.helper is None and not pal.skip and pal.backend == 'process' and not pal.plan.live and pal.loop is None \
+           and pal.stream not in self.screens and not pal.config.redirect:
+            # - the helper only gets the plan once, so live fields like {count} stay with the renderer thread,
+            #   and it draws on its own, so not next to other live regions or redirected output
+            pal.helper = starting
+            self.spawns.append(pal)
+        if pal.helper:
+            pass # - drawn by its own helper process
+        elif not pal.skip and notebook_wanted(pal):
+            from .notebook import NotebookLine
+            pal.notebook = NotebookLine(pal)
+            if pal.plan.live and not pal.watched:
+                # - the live fields get sent now and then from `BusyPal.watch`
+                pal.watched, pal.watch_due = True, pal.notebook.due
+                self.watched.append(pal)
+                self.wake()
+        elif not pal.skip:
+            pal.tick, pal.due = 0, time.monotonic()
+            pal.line, pal.shown_at = pal.render(pal.due), pal.due
+            screen = self.screens.get(pal.stream)
+            if screen is None:
+                screen = self.screens[pal.stream] = Screen(pal.stream)
+            screen.add(pal)
+            pal.drawn = True
+            if pal.loop is None:
+                self.wake()
+            else:
+                self.kick(pal.loop, pal.due)
+        # *** don't output anything - neigther the message (even if provided) nor the animation - if:
+        #       * `skip` is explicitely set to something more than 1 (which can be 2)
+        # *** otherwise just skip the animation part and write the message if:
+        #       * `skip` is explicitely set to 1
+        #                  - or -
+        #       * the output is not being viewed on the screen (i.e. redirected to a file or something)
+        elif pal.skip == 1 and pal.logged:
+            log = self.logs.get(pal.stream)
+            if log is None:
+                log = self.logs[pal.stream] = Log(pal.stream, pal.config.log_interval, time.monotonic())
+                self.wake()
+            log.interval = min(log.interval, pal.config.log_interval)
+            log.pals.append(pal)
+        elif pal.skip == 1 and pal.message != '':
+            pal.stream.write(f'{pal.message}\n')
+            self.invalidate()
+
+    def remove(self, pal, final=None, newline=True):
+        '''
+        Takes `pal` off the screen and writes its `final` line (or blanks the line out if it is None).
+        Once this returns, no frame of `pal` can be drawn anymore. Returns False if `pal` was never
+        shown because it finished within its grace period.
+        '''
+        with self.condition:
+            while pal.helper is starting:
+                self.condition.wait()
+            if pal.watched and pal in self.watched: # - unless dropped after a failure
+                self.watched.remove(pal)
+            if pal.pending is not None:
+                if pal.loop is None:
+                    self.queue.remove(pal.pending)
+                    heapq.heapify(self.queue)
+                else:
+                    pal.pending.cancel() # - the TimerHandle of `launch`
+                pal.pending = None
+                return False
+            process = pal.helper
+            if pal.notebook is not None:
+                pal.notebook.finish(final)
+            elif pal.shown and pal.logged:
+                log = self.logs.get(pal.stream)
+                if log is not None and pal in log.pals:
+                    log.pals.remove(pal)
+                    if not log.pals:
+                        del self.logs[pal.stream]
+                    try:
+                        pal.stream.write(final)
+                        pal.stream.flush()
+                    except Exception:
+                        report_error(f'could not write the outcome of {pal.key!r}')
+                    self.invalidate()
+            elif pal.shown and not pal.skip and not process:
+                pal.drawn = False # - from now on `write` goes straight to the stream
+                screen = self.screens.get(pal.stream)
+                if screen is not None and pal in screen.pals:
+                    if len(screen.pals) == 1:
+                        del self.screens[pal.stream]
+                    try:
+                        screen.finish(pal, final, newline, pal.drain(flush=True))
+                    except Exception:
+                        report_error(f'could not write the outcome of {pal.key!r}')
+            if pal.loop is not None and pal.loop in self.tickers and \
+               not any(other.loop is pal.loop for screen in self.screens.values() for other in screen.pals):
+                # - its last region: the pending tick would keep the loop referenced long after it is closed
+                self.tickers.pop(pal.loop)[1].cancel()
+        if process:
+            # - outside of the lock: the others keep spinning while the helper writes its last line
+            from . import helper
+            helper.finish(process, final, newline)
+        return True
+
+    def start_helpers(self):
+        '''
+        Starts the helper processes of the regions `show` left in `spawns`, without holding the lock
+        so that the other regions keep spinning meanwhile. A region whose helper can't be started is
+        drawn by the renderer thread instead.
+        '''
+        from . import helper
+        with self.condition:
+            spawns, self.spawns = self.spawns, []
+        for pal in spawns:
+            try:
+                process = helper.spawn(pal)
+            except Exception:
+                report_error(f'could not start the helper process of {pal.key!r}')
+                process = None
+            with self.condition:
+                pal.helper = process or False # - False: not to be tried again
+                if not process:
+                    self.guarded_show(pal)
+                self.condition.notify_all() # - `remove` may be waiting for it
+
+    def tick(self, now, loop=None):
+        '''
+        Draws the next frame of the regions driven by `loop` (None for the renderer thread) that are
+        due by `now` and returns when the next one of them is due (None if there is none).
+        '''
+        wakeup = None
+        for stream, screen in list(self.screens.items()):
+            started = time.thread_time()
+            due = []
+            for pal in list(screen.pals):
+                if pal.loop is not loop:
+                    continue
+                try:
+                    if pal.due <= now:
+                        if pal.adaptive:
+                            pal.pace(now-pal.due, self.cpu_load(now))
+                        pal.line = pal.render(now)
+                        pal.tick += 1
+                        pal.due += pal.delay
+                        if pal.due <= now:
+                            # - we fell behind: skip the missed frames instead of drawing a burst of them
+                            pal.due = now + pal.delay
+                        due.append(pal)
+                except Exception:
+                    report_error(f'{pal.key!r} failed to draw and is no longer animated')
+                    self.drop(pal)
+                    continue
+                if wakeup is None or pal.due < wakeup:
+                    wakeup = pal.due
+            if due:
+                try:
+                    # - whatever was `write`n in the meantime goes out with this frame
+                    screen.draw(''.join(pal.drain() for pal in screen.pals), now)
+                except Exception:
+                    report_error('could not draw on its output, the regions there are no longer animated')
+                    for pal in list(screen.pals):
+                        self.drop(pal)
+                    continue
+                spent = (time.thread_time()-started)/len(due)
+                for pal in due:
+                    pal.frames += 1
+                    pal.render_time += spent
+        return wakeup
+
+    def invalidate(self):
+        ''' Has the next frame of each screen drawn in full, after something else was written that may have landed on it '''
+        with self.condition:
+            for screen in self.screens.values():
+                screen.cells = None
+
+    def drop(self, pal):
+        ' Takes `pal` off its screen without a word, after it failed '
+        screen = self.screens.get(pal.stream)
+        if screen is not None and pal in screen.pals:
+            screen.pals.remove(pal)
+            if not screen.pals:
+                del self.screens[pal.stream]
+        pal.drawn = False
+
+    def run(self):
+        with self.condition:
+            while True:
+                try:
+                    wakeup = self.step(time.monotonic())
+                except Exception:
+                    # - the last line of defence: whatever happens, the thread goes on for the other regions
+                    report_error('the renderer ran into an error')
+                    wakeup = time.monotonic() + 0.1
+                if self.spawns:
+                    self.condition.release()
+                    try:
+                        self.start_helpers()
+                    finally:
+                        self.condition.acquire()
+                    continue
+                self.condition.wait(None if wakeup is None else wakeup-time.monotonic())
+
+    def step(self, now):
+        ''' Does whatever is due by `now` on the renderer thread and returns when to wake up next '''
+        while self.queue and self.queue[0][0] <= now:
+            pal = heapq.heappop(self.queue)[2]
+            pal.pending = None
+            self.guarded_show(pal)
+        wakeup = self.tick(now)
+        for pal in list(self.watched):
+            try:
+                if pal.watch_due <= now:
+                    pal.watch_due = pal.watch(now)
+            except Exception:
+                report_error(f'{pal.key!r} is no longer watched (profiler, stall watchdog, notebook updates)')
+                self.watched.remove(pal)
+                continue
+            if wakeup is None or pal.watch_due < wakeup:
+                wakeup = pal.watch_due
+        for stream, log in list(self.logs.items()):
+            try:
+                if log.due <= now:
+                    log.write(now)
+            except Exception:
+                report_error('could not log the heartbeats of the regions there')
+                del self.logs[stream]
+                continue
+            if wakeup is None or log.due < wakeup:
+                wakeup = log.due
+        if self.queue and (wakeup is None or self.queue[0][0] < wakeup):
+            wakeup = self.queue[0][0]
+        return wakeup
+
+    def kick(self, loop, wakeup):
+        ''' Makes sure that the tick chain of `loop` runs no later than `wakeup` '''
+        ticker = self.tickers.get(loop)
+        if ticker is not None:
+            if ticker[0] <= wakeup:
+                return
+            ticker[1].cancel()
+        self.tickers[loop] = (wakeup, loop.call_later(max(wakeup-time.monotonic(), 0), self.tick_loop, loop))
+
+    def tick_loop(self, loop):
+        with self.condition:
+            del self.tickers[loop]
+            wakeup = self.tick(time.monotonic(), loop) # - failures are dealt with region by region in there
+            if wakeup is not None:
+                # - once none of its regions is live anymore, the chain of `loop` simply stops here
+                self.kick(loop, wakeup)
+
+    def cpu_load(self, now):
+        ''' The system-wide CPU load between 0 and 1, sampled at most once per second '''
+        if self.load_sampled is None or now-self.load_sampled >= 1.0:
+            import psutil
+            self.load, self.load_sampled = psutil.cpu_percent(interval=None)/100, now
+        return self.load
+
+    def reset(self):
+        ' Starts over in a forked child, where the thread is gone and the lock may have been held '
+        self.__init__()
+
+renderer = Renderer()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=renderer.reset)
@@ -6,16 +6,70 @@ Acquires the following information about the running session:
 (1) Type (terminal, notebook, spyder, etc.)
 (2) Stdout/Stderr redirection
 (3) Javascript compatibility
+
+None of these answers change during the lifetime of a process, so the probes are
+memoized per process id (a forked child recomputes them on first use). Call
+`invalidate()` to force them to be recomputed anyway.
 '''
 
 import os
 import sys
-from contextlib import redirect_stderr
-import re
-import psutil
-from multiprocessing import current_process
-from io import StringIO         # python 3
-# from StringIO import StringIO # python 2 (who cares?)
+from functools import wraps, lru_cache
+# - psutil, re, multiprocessing, etc. are imported where they are needed so that
+#   importing this module costs next to nothing until a probe actually runs
+
+_probes = {}      # cached probe results of the process with id `_probes_pid`
+_probes_pid = None
+
+def memoized(probe):
+    ' Computes `probe()` once per process and serves the cached answer afterwards '
+    name = probe.__name__
+    @wraps(probe)
+    def wrapper():
+        global _probes_pid
+        pid = os.getpid()
+        if _probes_pid != pid:
+            # - we are in a fresh (e.g. forked) process: the parent's answers don't apply to us
+            _probes.clear()
+            _probes_pid = pid
+        try:
+            return _probes[name]
+        except KeyError:
+            result = _probes[name] = probe()
+            return result
+    return wrapper
+
+def invalidate():
+    ' Forgets all the memoized probe results so that they are recomputed on their next call '
+    _probes.clear()
+
+@memoized
+def parent_cmdline():
+    ' The command line of the parent process as a list of strings '
+    if sys.platform.startswith('linux'):
+        # - fast path: read it directly instead of building psutil.Process objects
+        try:
+            with open('/proc/{}/cmdline'.format(os.getppid()), 'rb') as f:
+                data = f.read()
+        except OSError:
+            pass
+        else:
+            if data.endswith(b'\0'):
+                data = data[:-1]
+            cmdline = [os.fsdecode(arg) for arg in data.split(b'\0')]
+            if len(cmdline) == 1 and ' ' in cmdline[0]:
+                # - some processes overwrite their argv with a single space-separated string (psutil does the same)
+                cmdline = cmdline[0].split(' ')
+            if cmdline != ['']:
+                return cmdline
+    # - psutil is cross-platform
+    import psutil
+    return psutil.Process().parent().cmdline()
+
+@lru_cache(maxsize=None)
+def whole_word_regex(whole_word):
+    import re
+    return re.compile(r'\b{}\b'.format(whole_word))
 
 def isterminal():
     '''
@@ -38,6 +92,7 @@ def isipythonterminal():
     except NameError:
         return False       # Probably a standard Python interpreter running e.g. in your bash shell
 
+@memoized
 def isipythongui(): # with advanced functionalities (e.g. inline plots) but not extensible as notebooks
     if any(s in session_type() for s in ['qt-console', 'spyder']): ## more to add?
         return True
@@ -46,6 +101,7 @@ def isipythongui(): # with advanced functionalities (e.g. inline plots) but not
 
 # tested on Spyder, Qt Console, JupyterLab, Jupyter Notebook, IPython terminal, Google Colab, OSX default terminal, iTerm2
 # courtesy of https://github.com/tqdm/tqdm/issues/443#issuecomment-369453219
+@memoized
 def isnotebook():
     ' Are we running this in a notebook (jupyter lab/notebook or google colab) environment? '
     # - you can add more than just jupyter lab/notebook if you know more that exist. This currently
@@ -53,15 +109,13 @@ def isnotebook():
     return cmdline_has('jupyter-(lab|notebook)')
 
 def cmdline_has(whole_word):
-    # - psutil is cross-platform
-    if any(
-            re.search(r'\b{}\b'.format(whole_word), s)
-            for s in psutil.Process().parent().cmdline()
-    ):
+    regex = whole_word_regex(whole_word)
+    if any(regex.search(s) for s in parent_cmdline()):
         return True
     else:
         return False
 
+@memoized
 def session_type():
     ' A more general function which gives you the session type as a string '
     try:
@@ -85,7 +139,7 @@ def session_type():
         return 'spyder'                     # IPython running from the Spyder IDE
                                             # ... Can we add more GUIs, IDEs, etc. here? ...
     else:
-        shell = psutil.Process().parent().cmdline()[0]
+        shell = parent_cmdline()[0]
         # - now pull the exact name out
         if os.name == 'nt':                 # Windows (e.g. shell = 'Explorer.EXE' for python executable,
                                             # 'pythonw.exe' for IDLE python executable,
@@ -117,6 +171,7 @@ def session_type():
 #     except NameError:
 #         return False      # Probably standard Python interpreter
 
+@memoized
 def viewedonscreen():
     ' Checks whether the stdout/stderr directly gets dumped to the screen or is being redirected to a file '
     if isterminal() or isipythonterminal() or isipythongui() or isnotebook():
@@ -124,13 +179,19 @@ def viewedonscreen():
     else:
         return False
 
+@memoized
 def isparent():
     ' Main/parent or forked etc.? '
+    from multiprocessing import current_process
     return current_process().name=='MainProcess'
 
+@memoized
 def javascript_friendly():
     ' Checks whether we are able to run codes that require javascript through ipywidgets '
     # `javascript_friendly()==True` also means `viewedonscreen()==True`
+    from contextlib import redirect_stderr
+    from io import StringIO         # python 3
+    # from StringIO import StringIO # python 2 (who cares?)
     try:
         from ipywidgets import IntSlider
         IntSlider()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+Where BusyPal draws: `BusyPal(sink=...)` takes 'stdout' (the default, resolved when the region is
+entered so that `contextlib.redirect_stdout` keeps working), 'stderr', a file descriptor, a text
+stream, a callable that gets the bytes of each write, or any of the Sink classes below, e.g. a
+MemorySink to look at the frames in tests.
+
+Sinks are file-like enough to stand in for a stream (`write`, `flush`, `fileno`, `isatty`), but the
+renderer hands each frame to `send` as a single pre-encoded bytes write. On sinks that `diff`
+(terminals, by default), it only sends the characters that changed since the previous frame.
+'''
+
+import os
+import sys
+
+class Sink:
+    ' The base class of the sinks: subclasses implement `send` '
+
+    encoding = 'utf-8'
+    diff = False # - whether the renderer may send only what changed since the last frame (cursor movements)
+
+    def send(self, data):
+        raise NotImplementedError
+
+    def write(self, text):
+        self.send(text.encode(self.encoding, 'replace'))
+        return len(text)
+
+    def flush(self):
+        pass # - every `send` reaches its target right away
+
+    def fileno(self):
+        import io
+        raise io.UnsupportedOperation(f'{type(self).__name__} has no file descriptor')
+
+    def isatty(self):
+        return False
+
+class StreamSink(Sink):
+    ' A text stream such as sys.stdout, written to through its binary buffer when it has one '
+
+    def __init__(self, stream, diff=None):
+        self.stream = stream
+        self.encoding = getattr(stream, 'encoding', None) or 'utf-8'
+        self.diff = self.isatty() if diff is None else diff
+
+    def send(self, data):
+        buffer = getattr(self.stream, 'buffer', None)
+        if buffer is None:
+            self.stream.write(data.decode(self.encoding, 'replace'))
+            self.stream.flush()
+        else:
+            self.stream.flush() # - whatever print() left in the text layer goes out first
+            buffer.write(data)
+            buffer.flush()
+
+    def flush(self):
+        self.stream.flush()
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def isatty(self):
+        try:
+            return self.stream.isatty()
+        except (AttributeError, ValueError): # - no isatty(), or closed
+            return False
+
+    # - regions drawing on the same stream share its screen, whichever sink object they came with
+    def __eq__(self, other):
+        return type(other) is type(self) and other.stream is self.stream
+
+    def __hash__(self):
+        return hash(id(self.stream))
+
+class FdSink(Sink):
+    ' A raw file descriptor, written to with `os.write` and no buffering in between '
+
+    def __init__(self, fd, encoding='utf-8', diff=None):
+        self.fd = fd
+        self.encoding = encoding
+        self.diff = self.isatty() if diff is None else diff
+
+    def send(self, data):
+        while data:
+            data = data[os.write(self.fd, data):]
+
+    def fileno(self):
+        return self.fd
+
+    def isatty(self):
+        return os.isatty(self.fd)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.fd == self.fd
+
+    def __hash__(self):
+        return hash(self.fd)
+
+class MemorySink(Sink):
+    ' Keeps everything in memory, for tests: `data` holds the bytes, `getvalue()` the text '
+
+    def __init__(self, encoding='utf-8', diff=False):
+        self.data = bytearray()
+        self.writes = 0
+        self.encoding = encoding
+        self.diff = diff
+
+    def send(self, data):
+        self.data += data
+        self.writes += 1
+
+    def getvalue(self):
+        return self.data.decode(self.encoding, 'replace')
+
+class CallbackSink(Sink):
+    ' Hands the bytes of every write to `callback` '
+
+    def __init__(self, callback, encoding='utf-8', diff=False):
+        self.callback = callback
+        self.encoding = encoding
+        self.diff = diff
+
+    def send(self, data):
+        self.callback(data)
+
+def check(spec):
+    ''' Raises a ValueError if `resolve` won't make sense of `spec` '''
+    if not (spec in (None, 'stdout', 'stderr') or isinstance(spec, (Sink, int)) or hasattr(spec, 'write') or callable(spec)):
+        raise ValueError("`sink` should be 'stdout', 'stderr', a file descriptor, a stream, a callable or a Sink.")
+
+streams = {} # - the StreamSink of the streams seen last, keyed by id, so that entering a region doesn't cost an isatty() call
+
+def stream_sink(stream):
+    sink = streams.get(id(stream))
+    if sink is None or sink.stream is not stream:
+        if len(streams) > 16:
+            streams.clear()
+        sink = streams[id(stream)] = StreamSink(stream)
+    return sink
+
+def reaches(sink, stream):
+    ''' Whether what is written to `stream` ends up where `sink` draws, e.g. on the same terminal '''
+    if isinstance(sink, StreamSink) and sink.stream is stream:
+        return True
+    try:
+        drawn, written = os.fstat(sink.fileno()), os.fstat(stream.fileno())
+    except (AttributeError, ValueError, OSError): # - no file descriptor behind one of them
+        return False
+    return (drawn.st_dev, drawn.st_ino) == (written.st_dev, written.st_ino)
+
+def resolve(spec):
+    ''' The Sink described by `spec` (see the module docstring) '''
+    if spec is None or spec == 'stdout':
+        return stream_sink(sys.stdout)
+    if spec == 'stderr':
+        return stream_sink(sys.stderr)
+    if isinstance(spec, Sink):
+        return spec
+    if isinstance(spec, int):
+        return FdSink(spec)
+    if hasattr(spec, 'write'):
+        return stream_sink(spec)
+    return CallbackSink(spec)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''
+A process-wide registry of how long busy regions take.
+
+Every BusyPal region, and so every call of a `@busy` function, records its wall time, the CPU time
+of its thread and whether it failed under a key: the qualified name of the decorated function, or
+the message of a `with BusyPal(...)` block. Each key keeps its count, min, max and mean as well as
+a histogram for the 50th, 95th and 99th percentiles, in bounded memory however many calls it sees.
+Regions that were animated also add up their frames, the time they were shown for and the CPU
+time the renderer spent drawing them, hence the effective frame rate (`fps`) and `render_cpu`.
+
+>>> busypal.timings.table()  # a plain text table, or .json() / .as_dict() for the raw numbers
+
+The CPU time of an `async with` region is that of the event loop's thread, so it includes whatever
+other tasks ran in the meantime. Set `busypal.timing.enabled = False` to stop recording.
+'''
+
+import math
+import threading
+
+enabled = True
+percentiles = (0.5, 0.95, 0.99)
+
+class Histogram:
+    '''
+    A streaming percentile sketch: counts per logarithmic bucket, each bucket 2% wider than the
+    previous one, so that any percentile comes out within 1% of the exact value. From a nanosecond
+    to a week there are at most ~1700 buckets, whatever the number of samples, and adding one is a
+    log and a dict increment.
+    '''
+
+    scale = 1/math.log(1.02)
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+
+    def add(self, x):
+        bucket = math.floor(math.log(max(x, 1e-9))*self.scale)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank, seen = p*self.count, 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                break
+        return math.exp((bucket+0.5)/self.scale)
+
+class Timing:
+    ' The statistics of one key '
+
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.total = 0.0
+        self.cpu = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.histogram = Histogram()
+        self.frames = 0
+        self.shown = 0.0
+        self.render_time = 0.0
+
+    def add(self, wall, cpu, failed=False, frames=0, shown=0.0, render_time=0.0):
+        self.frames += frames
+        self.shown += shown
+        self.render_time += render_time
+        self.count += 1
+        self.failed += failed
+        self.total += wall
+        self.cpu += cpu
+        if wall < self.min:
+            self.min = wall
+        if wall > self.max:
+            self.max = wall
+        self.histogram.add(wall)
+
+    def as_dict(self):
+        stats = {'count': self.count, 'failed': self.failed, 'total': self.total, 'cpu': self.cpu,
+                 'mean': self.total/self.count if self.count else None,
+                 'min': self.min if self.count else None, 'max': self.max if self.count else None,
+                 'frames': self.frames, 'fps': self.frames/self.shown if self.shown else None, 'render_cpu': self.render_time}
+        for p in percentiles:
+            value = self.histogram.percentile(p)
+            # - the bucket's midpoint could stray a little beyond the extremes
+            stats[f'p{round(100*p)}'] = None if value is None else min(max(value, self.min), self.max)
+        return stats
+
+class Registry:
+
+    def __init__(self):
+        self.timings = {}
+        self.lock = threading.Lock() # - regions on several threads may finish under the same key at once
+
+    def record(self, key, wall, cpu, failed=False, frames=0, shown=0.0, render_time=0.0):
+        with self.lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                timing = self.timings[key] = Timing()
+            timing.add(wall, cpu, failed, frames, shown, render_time)
+
+    def get(self, key):
+        with self.lock:
+            timing = self.timings.get(key)
+            return None if timing is None else timing.as_dict()
+
+    def as_dict(self):
+        with self.lock:
+            return {key: timing.as_dict() for key, timing in self.timings.items()}
+
+    def json(self, **kwargs):
+        import json
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def table(self):
+        ' The statistics of every key as a text table, times in ms, slowest keys (by total time) first '
+        stats = sorted(self.as_dict().items(), key=lambda item: -item[1]['total'])
+        width = max([len(key) for key, _ in stats] + [3])
+        columns = ['mean', 'min', 'p50', 'p95', 'p99', 'max']
+        lines = [f'{"key":<{width}} {"count":>7} {"failed":>6} ' + ' '.join(f'{column:>9}' for column in columns) + f' {"cpu %":>6}']
+        for key, entry in stats:
+            cpu = f'{100*entry["cpu"]/entry["total"]:6.1f}' if entry['total'] else f'{"-":>6}'
+            lines.append(f'{key:<{width}} {entry["count"]:>7} {entry["failed"]:>6} ' +
+                         ' '.join(f'{1000*entry[column]:9.2f}' for column in columns) + f' {cpu}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+
+timings = Registry()
@@ -0,0 +1,2 @@
+# - here so that pytest puts the root of the repository on `sys.path`, and `pytest tests` imports
+#   this busypal rather than an installed one
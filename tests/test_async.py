@@ -0,0 +1,29 @@
+'''
+Async regions are ticked by their event loop, which the renderer lets go of once its last region
+is over; `@busy` tells coroutine functions apart without importing `inspect`.
+
+    python -m pytest tests
+'''
+
+import asyncio
+
+from busypal import BusyPal, busy
+from busypal.render import renderer
+from busypal.sink import MemorySink
+
+def test_loops_released():
+    async def main():
+        async with BusyPal('async', skip=-1, delay=0.005, sink=MemorySink()):
+            await asyncio.sleep(0.02)
+    for _ in range(3):
+        asyncio.run(main())
+    assert not [loop for loop in renderer.tickers if loop.is_closed()]
+
+def test_busy_coroutine():
+    sink = MemorySink()
+    @busy('awaited', skip=-1, delay=0.005, sink=sink)
+    async def work():
+        await asyncio.sleep(0.03)
+        return 42
+    assert asyncio.run(work()) == 42
+    assert sink.writes > 2 and 'Done!' in sink.getvalue()
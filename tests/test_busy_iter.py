@@ -0,0 +1,57 @@
+'''
+A `busy_iter` region only ends as done when it went through all of its items, or when a `with`
+block around it is left without an exception. A plain loop left early ends as stopped, which is
+not counted as a failure.
+
+    python -m pytest tests
+'''
+
+import re
+
+import pytest
+
+from busypal import busy_iter, timings
+from busypal.sink import MemorySink
+
+def outcome(sink):
+    return re.sub('\x1b\\[[0-9;]*[A-Za-z]', '', sink.getvalue()).rstrip().split('\r')[-1].split()[-1]
+
+def iterate(message, sink, stop=None, raising=False, within=False):
+    def loop(items):
+        for item in items:
+            if item == stop:
+                if raising:
+                    raise ValueError
+                break
+    region = busy_iter(range(10), message, skip=-1, sink=sink)
+    try:
+        if within:
+            with region as items:
+                loop(items)
+        else:
+            loop(region)
+    except ValueError:
+        pass
+
+@pytest.mark.parametrize('within', [False, True])
+def test_exhausted(within):
+    sink = MemorySink()
+    iterate('exhausted', sink, within=within)
+    assert outcome(sink) == 'Done!'
+    assert '10/10' in sink.getvalue()
+
+@pytest.mark.parametrize('within', [False, True])
+def test_exception(within):
+    sink = MemorySink()
+    iterate(f'raising {within}', sink, stop=3, raising=True, within=within)
+    assert outcome(sink) == ('Failed!' if within else 'Stopped.')
+    assert timings.get(f'raising {within}')['failed'] == within
+
+def test_break():
+    sink = MemorySink()
+    iterate('break', sink, stop=3)
+    assert outcome(sink) == 'Stopped.' and sink.getvalue().endswith('\n')
+    assert timings.get('break')['failed'] == 0
+    sink = MemorySink()
+    iterate('break within', sink, stop=3, within=True)
+    assert outcome(sink) == 'Done!'
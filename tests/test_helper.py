@@ -0,0 +1,43 @@
+'''
+The helper process of a `backend='process'` region is started without holding the renderer's lock,
+whether the region shows up right away or after its `show_after` grace period.
+
+    python -m pytest tests
+'''
+
+import time
+from contextlib import nullcontext
+
+import pytest
+
+from busypal import BusyPal, helper
+from busypal.render import renderer
+from busypal.sink import MemorySink
+
+@pytest.mark.parametrize('show_after', [0, 0.01])
+def test_spawn_outside_lock(monkeypatch, show_after):
+    locked = []
+    def spawn(pal):
+        # - a lock that is free can be taken from here, a held one would be owned by this thread or block
+        free = not renderer.condition._is_owned() and renderer.condition.acquire(timeout=1)
+        if free:
+            renderer.condition.release()
+        locked.append(not free)
+        return None # - falls back to the renderer thread
+    monkeypatch.setattr(helper, 'spawn', spawn)
+    sink = MemorySink()
+    with BusyPal('helped', skip=-1, backend='process', show_after=show_after, delay=0.005, sink=sink) as pal:
+        time.sleep(0.05)
+    assert locked == [False]
+    assert pal.helper is False and 'helped' in sink.getvalue()
+
+@pytest.mark.parametrize('shared', ['region', 'redirect'])
+def test_shared_output(monkeypatch, tmp_path, shared):
+    spawned = []
+    monkeypatch.setattr(helper, 'spawn', lambda pal: spawned.append(pal))
+    with open(tmp_path/'out', 'wb') as out:
+        sink = out.fileno()
+        with BusyPal('first', skip=-1, delay=0.005, sink=sink) if shared == 'region' else nullcontext():
+            with BusyPal('helped', skip=-1, backend='process', delay=0.005, sink=sink, redirect=shared == 'redirect') as pal:
+                time.sleep(0.02)
+    assert spawned == [] and pal.helper is None # - drawn by the renderer thread along with the others
@@ -0,0 +1,24 @@
+'''
+`import busypal`, and the startup path of a CLI tool (importing `busy` and decorating a function
+with it), load none of the heavy dependencies that are only needed once a spinner is drawn, and
+stay within the (loose) time budget of benchmarks/importtime.py.
+
+    python -m pytest tests
+'''
+
+import os
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+import importtime
+
+@pytest.mark.parametrize('name', list(importtime.statements))
+def test_importtime(monkeypatch, name):
+    monkeypatch.chdir(root) # - so that the package imported is this one
+    ms, modules = importtime.importtime(importtime.statements[name])
+    assert [module for module in importtime.deferred if module in modules] == []
+    assert ms <= importtime.budget, f'{name} took {ms:.2f} ms, the budget is {importtime.budget} ms'
@@ -0,0 +1,58 @@
+'''
+A region, or an output, that fails on the renderer thread is reported on stderr and dropped, while
+the other regions keep being animated.
+
+    python -m pytest tests
+'''
+
+import time
+
+import pytest
+
+from busypal import BusyPal
+from busypal.render import renderer
+from busypal.sink import MemorySink
+
+delay = 0.005
+
+class BrokenSink(MemorySink):
+    ' Like a closed pipe '
+
+    def send(self, data):
+        raise BrokenPipeError
+
+def frames(sink):
+    before = sink.writes
+    time.sleep(10*delay)
+    return sink.writes - before
+
+def test_broken_sink(capsys):
+    sink = MemorySink()
+    with BusyPal('fine', skip=-1, delay=delay, sink=sink):
+        with BusyPal('broken', skip=-1, delay=delay, sink=BrokenSink()):
+            time.sleep(5*delay)
+        assert frames(sink) > 0
+    assert renderer.thread.is_alive()
+    assert 'BrokenPipeError' in capsys.readouterr().err
+
+def test_failing_region(capsys):
+    sink = MemorySink()
+    with BusyPal('fine', skip=-1, delay=delay, sink=sink):
+        pal = BusyPal('failing', skip=-1, delay=delay, sink=MemorySink())
+        with pal:
+            time.sleep(2*delay)
+            pal.render = lambda now: 1/0
+            time.sleep(5*delay)
+        assert frames(sink) > 0
+    assert 'ZeroDivisionError' in capsys.readouterr().err
+    assert 'fine' in sink.getvalue()
+
+@pytest.mark.parametrize('delay', [0, -0.1, 'x'])
+def test_bad_delay(delay):
+    with pytest.raises(ValueError):
+        BusyPal('spinning', delay=delay)
+
+@pytest.mark.parametrize('adaptive', [(0, 1), (-1, 1), (0.2, 0.1), ('a', 'b')])
+def test_bad_adaptive(adaptive):
+    with pytest.raises(ValueError):
+        BusyPal('spinning', adaptive=adaptive)
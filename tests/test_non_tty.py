@@ -0,0 +1,52 @@
+'''
+Regions whose output is not viewed on screen log a heartbeat line now and then (`non_tty`), then
+their outcome, instead of being animated.
+
+    python -m pytest tests
+'''
+
+import json
+import time
+
+import pytest
+
+from busypal import BusyPal, session
+from busypal.sink import MemorySink
+
+@pytest.fixture(autouse=True)
+def offscreen(monkeypatch):
+    monkeypatch.setattr(session, 'viewedonscreen', lambda: False)
+
+def test_message():
+    sink = MemorySink()
+    with BusyPal('Quiet', sink=sink, log_interval=0.02):
+        time.sleep(0.07)
+    assert sink.getvalue() == 'Quiet\n'
+
+@pytest.mark.parametrize('failed', [False, True])
+def test_heartbeat(failed):
+    sink = MemorySink()
+    try:
+        with BusyPal('Crunching', sink=sink, non_tty='heartbeat', log_interval=0.05, total=10, unit='rows') as pal:
+            for _ in range(4):
+                pal.count += 2
+                time.sleep(0.04)
+            if failed:
+                raise ValueError
+    except ValueError:
+        pass
+    lines = sink.getvalue().splitlines()
+    assert len(lines) >= 3 and all(line.startswith('Crunching busy for ') for line in lines[:-1])
+    assert lines[-1].startswith('Crunching Failed! in ' if failed else 'Crunching Done! in ')
+    assert '(8/10 rows, ' in lines[-1]
+    assert sink.writes == len(lines) # - one write per heartbeat (a single one for all the regions due)
+
+def test_json():
+    sink = MemorySink()
+    with BusyPal('Crunching', sink=sink, non_tty='json', log_interval=0.05) as pal:
+        pal.count = 5
+        time.sleep(0.12)
+    records = [json.loads(line) for line in sink.getvalue().splitlines()]
+    assert len(records) >= 2 and all('outcome' not in record for record in records[:-1])
+    assert records[-1]['outcome'] == 'done' and records[-1]['count'] == 5 and records[-1]['message'] == 'Crunching'
+    assert records[-1]['elapsed'] >= 0.12
@@ -0,0 +1,56 @@
+'''
+The notebook backend, tried out with a stand-in for IPython's `display`: one output per region,
+updates of its live fields now and then, and the outcome as plain text at the end.
+
+    python -m pytest tests
+'''
+
+import time
+
+import busypal
+from busypal import BusyPal
+
+class Handle:
+
+    def __init__(self, bundle):
+        self.bundles = [bundle]
+
+    def update(self, bundle):
+        self.bundles.append(bundle)
+
+def stub(monkeypatch):
+    handles = []
+    def display(bundle):
+        handles.append(Handle(bundle))
+        return handles[-1]
+    monkeypatch.setattr(busypal.notebook, 'display', display)
+    monkeypatch.setattr(busypal.notebook, 'update_interval', 0.01)
+    return handles
+
+def test_live_fields(monkeypatch):
+    handles = stub(monkeypatch)
+    with BusyPal('Counting', backend='notebook', skip=-1, fmt='{spinner} {message} {count} {outcome}') as pal:
+        for _ in range(5):
+            pal.count += 1
+            time.sleep(0.03)
+    assert len(handles) == 1
+    bundles = handles[0].bundles
+    assert 'Counting' in bundles[0]['text/html']
+    updates = [bundle['text/html'] for bundle in bundles[1:-1]]
+    assert updates and all('text/html' in bundle for bundle in bundles[1:-1])
+    assert len(set(updates)) == len(updates) # - only sent when something changed
+    final = bundles[-1]
+    assert list(final) == ['text/plain'] and 'Counting 5' in final['text/plain'] and 'Done!' in final['text/plain']
+
+def test_static(monkeypatch):
+    handles = stub(monkeypatch)
+    with BusyPal('Static', backend='notebook', skip=-1):
+        time.sleep(0.05)
+    assert len(handles) == 1 and len(handles[0].bundles) == 2 # - shown, then the outcome
+
+def test_escaped(monkeypatch):
+    handles = stub(monkeypatch)
+    with BusyPal('a < b & c', backend='notebook', skip=-1, fmt='{spinner} {message} <b>{elapsed}</b> {outcome}'):
+        pass
+    html = handles[0].bundles[0]['text/html']
+    assert 'a &lt; b &amp; c' in html and '&lt;b&gt;' in html and '<b>' not in html
@@ -0,0 +1,81 @@
+'''
+The done/fail line of a region is the last thing it writes: once `__exit__` returns, no frame of
+it can show up anymore, whichever way it was drawn.
+
+    python -m pytest tests
+'''
+
+import re
+import time
+import asyncio
+import threading
+
+import pytest
+
+from busypal import BusyPal
+from busypal.sink import MemorySink
+
+delay = 0.002 # - frames as often as possible, to give a late frame every chance to sneak in
+
+def plain(text):
+    return re.sub('\x1b\\[[0-9;]*[A-Za-z]', '', text)
+
+def assert_final(sink, outcome, message):
+    ''' `sink` ends with the `outcome` line of `message` and nothing gets written after it '''
+    written = len(sink.data)
+    time.sleep(20*delay)
+    assert len(sink.data) == written, 'a frame was written after the region was over'
+    last = plain(sink.getvalue()).rstrip('\n').split('\n')[-1].split('\r')[-1]
+    assert message in last and last.rstrip().endswith(outcome), repr(last)
+
+@pytest.mark.parametrize('failed', [False, True])
+def test_thread(failed):
+    for _ in range(20):
+        sink = MemorySink()
+        try:
+            with BusyPal('plain', skip=-1, delay=delay, sink=sink):
+                time.sleep(5*delay)
+                if failed:
+                    raise ValueError
+        except ValueError:
+            pass
+        assert_final(sink, 'Failed!' if failed else 'Done!', 'plain')
+
+def test_show_after():
+    # - well clear of the grace period either way, so that which side of it we end up on is certain
+    for wait in (0, 0.005, 0.03, 0.05):
+        sink = MemorySink()
+        with BusyPal('late', skip=-1, delay=delay, sink=sink, show_after=0.015):
+            time.sleep(wait)
+        if wait < 0.015:
+            # - over within its grace period: nothing at all, not even a final line
+            time.sleep(0.03)
+            assert sink.data == b''
+        else:
+            assert_final(sink, 'Done!', 'late')
+
+def test_async():
+    sink = MemorySink()
+    async def main():
+        async with BusyPal('async', skip=-1, delay=delay, sink=sink):
+            await asyncio.sleep(20*delay)
+        assert_final(sink, 'Done!', 'async')
+    asyncio.run(main())
+
+def test_stacked():
+    sink = MemorySink()
+    def region(name, seconds):
+        with BusyPal(name, skip=-1, delay=delay, sink=sink):
+            time.sleep(seconds)
+    threads = [threading.Thread(target=region, args=(f'worker{i}', 0.02*(i+1))) for i in range(3)]
+    with BusyPal('outer', skip=-1, delay=delay, sink=sink):
+        with BusyPal('nested', skip=-1, delay=delay, sink=sink):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    assert_final(sink, 'Done!', 'outer')
+    text = plain(sink.getvalue())
+    for name in ('worker0', 'worker1', 'worker2', 'nested'):
+        # - each region's final line made it out above the live ones
+        assert re.search(f'{name}.*Done!', text)
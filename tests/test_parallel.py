@@ -0,0 +1,94 @@
+'''
+`busy_map` runs a function over the items in a pool behind a single line, whose count comes from
+the workers' reports into the board of its own region, even with other regions live in the process.
+
+    python -m pytest tests
+'''
+
+import re
+import time
+import threading
+import multiprocessing
+
+import pytest
+
+from busypal import busy_map, progress
+from busypal.sink import MemorySink
+
+def last_line(sink):
+    return re.sub('\x1b\\[[0-9;]*[A-Za-z]', '', sink.getvalue()).rstrip('\n').split('\n')[-1].split('\r')[-1]
+
+def slow(x):
+    time.sleep(0.002)
+    return x
+
+def test_concurrent_regions():
+    sinks = {'long': MemorySink(), 'short': MemorySink()}
+    def run(name, n):
+        busy_map(slow, range(n), name, executor='thread', max_workers=4, skip=-1, sink=sinks[name])
+    threads = [threading.Thread(target=run, args=('long', 60))]
+    threads[0].start()
+    time.sleep(0.01)
+    threads.append(threading.Thread(target=run, args=('short', 8)))
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+    assert 'long 60/60' in last_line(sinks['long'])
+    assert 'short 8/8' in last_line(sinks['short'])
+
+def report_once(board):
+    progress.attach(board)
+    progress.report(3)
+
+def test_worker_states():
+    board = progress.Board(4, stall_after=0.05, context='spawn')
+    progress.use(board)
+    try:
+        progress.report()
+        assert board.workers() == '1 alive'
+        time.sleep(0.1)
+        assert board.workers() == '0 alive, 1 stalled'
+        progress.idle()
+        assert board.workers() == '0 alive, 1 idle' # - out of work, which is not stalled
+    finally:
+        progress.use(None)
+    worker = multiprocessing.get_context('spawn').Process(target=report_once, args=(board,))
+    worker.start()
+    worker.join()
+    assert [entry['state'] for entry in board.snapshot()] == ['idle', 'exited']
+    assert board.workers() == '0 alive, 1 idle'
+    assert board.claim() == 1 and board.total() == 4 # - the slot of the exited worker is handed out again, its count kept
+
+def square(x):
+    time.sleep(0.001*(x % 3))
+    return x*x
+
+def test_ordered():
+    assert busy_map(square, range(50), 'ordered', chunksize=4, skip=-1, sink=MemorySink()) == [x*x for x in range(50)]
+
+def test_unordered():
+    results = busy_map(square, range(50), 'unordered', ordered=False, skip=-1, sink=MemorySink())
+    assert sorted(results) == [x*x for x in range(50)]
+
+def test_process_pool():
+    sink = MemorySink()
+    assert busy_map(square, range(20), 'processes', executor='process', max_workers=2, chunksize=5, skip=-1, sink=sink) == \
+           [x*x for x in range(20)]
+    assert 'processes 20/20' in last_line(sink)
+
+def failing(x):
+    if x == 0:
+        raise ValueError('bad item')
+    time.sleep(0.05)
+    return x
+
+def test_cancelled_on_failure():
+    called = []
+    def func(x):
+        called.append(x)
+        return failing(x)
+    sink = MemorySink()
+    with pytest.raises(ValueError):
+        busy_map(func, range(100), 'failing', max_workers=2, skip=-1, sink=sink)
+    assert len(called) < 10 # - the items still pending were cancelled
+    assert last_line(sink).rstrip().endswith('Failed!')
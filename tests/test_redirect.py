@@ -0,0 +1,64 @@
+'''
+With `redirect=True`, `sys.stdout` goes through the most recent live region and back to where it
+went before once they are all over, in whatever order they end.
+
+    python -m pytest tests
+'''
+
+import io
+import sys
+import logging
+import threading
+
+from busypal import BusyPal
+from busypal.busypal import Redirect
+from busypal.sink import StreamSink, reaches
+
+def test_out_of_order(monkeypatch):
+    stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    handler = logging.StreamHandler(stdout)
+    logging.getLogger().addHandler(handler)
+    try:
+        first, second = BusyPal('first', skip=-1, redirect=True), BusyPal('second', skip=-1, redirect=True)
+        entered, exit_first = threading.Event(), threading.Event()
+        def run_first():
+            with first:
+                entered.set()
+                exit_first.wait()
+        thread = threading.Thread(target=run_first)
+        thread.start()
+        entered.wait()
+        with second:
+            assert sys.stdout.pal is second and handler.stream is sys.stdout
+            exit_first.set()
+            thread.join()
+            assert sys.stdout.pal is second and handler.stream is sys.stdout
+        assert sys.stdout is stdout and handler.stream is stdout
+    finally:
+        logging.getLogger().removeHandler(handler)
+
+def test_attributes(monkeypatch):
+    stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    with BusyPal('forwarding', skip=-1, redirect=True):
+        assert isinstance(sys.stdout, Redirect)
+        assert sys.stdout.buffer is stdout.buffer # - not on the sink, so from the stream behind it
+        assert sys.stdout.encoding == 'utf-8' and not sys.stdout.isatty()
+        assert isinstance(sys.stdout.pal.stream, StreamSink)
+    assert sys.stdout is stdout
+
+def test_other_sink(monkeypatch):
+    stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+    stderr = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    monkeypatch.setattr(sys, 'stderr', stderr)
+    with BusyPal('on stderr', skip=-1, sink='stderr', redirect=True):
+        assert sys.stdout is stdout # - prints don't end up on stderr
+        assert isinstance(sys.stderr, Redirect)
+    assert sys.stderr is stderr
+
+def test_same_terminal(tmp_path):
+    with open(tmp_path/'out', 'w') as stdout, open(tmp_path/'out', 'a') as also, open(tmp_path/'err', 'w') as stderr:
+        sink = StreamSink(stdout)
+        assert reaches(sink, stdout) and reaches(sink, also) and not reaches(sink, stderr)
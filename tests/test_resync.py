@@ -0,0 +1,33 @@
+'''
+A line sent as what changed since the last frame is drawn in full again every `resync` seconds and
+right after anything else busypal writes, so that it recovers from whatever landed on it.
+
+    python -m pytest tests
+'''
+
+import time
+
+from busypal import BusyPal, render
+from busypal.render import renderer
+from busypal.sink import CallbackSink
+
+delay = 0.005
+
+def full(writes, message):
+    return sum(message in write.decode() for write in writes)
+
+def test_periodic(monkeypatch):
+    monkeypatch.setattr(render, 'resync', 10*delay)
+    writes = []
+    with BusyPal('resyncing', skip=-1, delay=delay, sink=CallbackSink(writes.append, diff=True)):
+        time.sleep(50*delay)
+    assert len(writes) > 20 and full(writes, 'resyncing') >= 3
+
+def test_after_write():
+    writes = []
+    with BusyPal('invalidated', skip=-1, delay=delay, sink=CallbackSink(writes.append, diff=True)):
+        time.sleep(10*delay)
+        before = full(writes, 'invalidated')
+        renderer.invalidate() # - as after a stall dump or a heartbeat line
+        time.sleep(5*delay)
+        assert full(writes, 'invalidated') > before
@@ -0,0 +1,45 @@
+'''
+The session probes are computed once per process and give the same answers as asking psutil.
+
+    python -m pytest tests
+'''
+
+import os
+import multiprocessing
+
+import psutil
+import pytest
+
+from busypal import session
+
+@pytest.fixture(autouse=True)
+def fresh():
+    session.invalidate()
+    yield
+    session.invalidate()
+
+def test_parent_cmdline():
+    assert session.parent_cmdline() == psutil.Process().parent().cmdline()
+
+def test_memoized():
+    first = session.session_type()
+    session._probes['session_type'] = 'fake' # - as if the probe had answered that
+    assert session.session_type() == 'fake'
+    session.invalidate()
+    assert session.session_type() == first
+    assert session.viewedonscreen() == session.viewedonscreen()
+
+def child(queue):
+    queue.put((session.parent_cmdline(), psutil.Process().parent().cmdline()))
+
+def test_per_pid():
+    session._probes['parent_cmdline'] = ['fake']
+    session._probes_pid = os.getpid()
+    assert session.parent_cmdline() == ['fake']
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=child, args=(queue,))
+    process.start()
+    cmdline, expected = queue.get(timeout=10)
+    process.join()
+    assert cmdline == expected != ['fake'] # - a forked child probes again rather than trusting its parent's answers
@@ -0,0 +1,29 @@
+'''
+The stall watchdog calls `on_stall` once per stall from the renderer thread, which keeps running
+if the callback raises.
+
+    python -m pytest tests
+'''
+
+import time
+
+from busypal import BusyPal
+from busypal.render import renderer
+from busypal.sink import MemorySink
+
+def test_on_stall_raising(capsys):
+    calls = []
+    def on_stall(pal):
+        calls.append(pal)
+        raise RuntimeError('on_stall failed')
+    sink = MemorySink()
+    with BusyPal('stalling', skip=-1, delay=0.005, sink=sink, stall_timeout=0.02, stall_dump=False, on_stall=on_stall) as pal:
+        time.sleep(0.1)
+        written = sink.writes
+        time.sleep(0.05)
+        assert sink.writes > written, 'the renderer stopped drawing'
+        pal.count += 1 # - some progress, then another stall
+        time.sleep(0.1)
+    assert calls == [pal, pal]
+    assert renderer.thread.is_alive()
+    assert 'on_stall failed' in capsys.readouterr().err
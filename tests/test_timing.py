@@ -0,0 +1,58 @@
+'''
+The timings registry: the statistics of every region, by key, including the frames drawn for it.
+
+    python -m pytest tests
+'''
+
+import json
+import math
+import time
+import random
+
+import pytest
+
+from busypal import busy, timings
+from busypal.timing import Registry
+from busypal.sink import MemorySink
+
+def test_render_stats():
+    @busy('Animated', skip=-1, delay=0.005, sink=MemorySink())
+    def animated():
+        time.sleep(0.05)
+    animated()
+    animated()
+    stats = timings.get(f'{animated.__module__}.{animated.__qualname__}')
+    assert stats['count'] == 2 and stats['frames'] > 6
+    assert 20 < stats['fps'] < 400 and stats['render_cpu'] > 0
+
+def exact(samples, p):
+    ' The smallest sample with at least a fraction `p` of them at or below it, as the histogram ranks them '
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(p*len(ordered)), 1)-1]
+
+@pytest.mark.parametrize('samples', [
+    [random.Random(0).lognormvariate(-4, 1) for _ in range(10000)],
+    [0.001*i for i in range(1, 1001)],
+    [0.5]*100,
+])
+def test_percentiles(samples):
+    registry = Registry()
+    for sample in samples:
+        registry.record('key', sample, sample/2)
+    stats = registry.get('key')
+    assert stats['count'] == len(samples) and stats['min'] == min(samples) and stats['max'] == max(samples)
+    assert stats['mean'] == pytest.approx(sum(samples)/len(samples))
+    for p in (0.5, 0.95, 0.99):
+        assert stats[f'p{round(100*p)}'] == pytest.approx(exact(samples, p), rel=0.01)
+
+def test_table():
+    registry = Registry()
+    registry.record('fast', 0.001, 0.001)
+    registry.record('slow', 2.0, 0.5, failed=True)
+    registry.record('slow', 4.0, 0.5)
+    lines = registry.table().splitlines()
+    assert lines[0].split() == ['key', 'count', 'failed', 'mean', 'min', 'p50', 'p95', 'p99', 'max', 'cpu', '%']
+    assert [line.split()[0] for line in lines[1:]] == ['slow', 'fast'] # - most total time first
+    slow = lines[1].split()
+    assert slow[1:4] == ['2', '1', '3000.00'] and slow[-1] == '16.7'
+    assert json.loads(registry.json())['fast']['count'] == 1